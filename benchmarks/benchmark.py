@@ -0,0 +1,339 @@
+"""Offline performance benchmarks for the myStrom Switch integration.
+
+Starts fake_device.py in a subprocess, so its CPU time does not count, and
+runs one or more scenarios against it:
+
+    poll         Back-to-back /report requests through MyStromAPI, reports
+                 throughput and latency percentiles
+    command      Relay commands through MyStromAPI, reports latency
+                 percentiles
+    integration  Coordinators driven by the poll scheduler inside a Home
+                 Assistant core instance, reports CPU time per device and
+                 memory per entry (needs homeassistant installed). With
+                 --workers the devices are polled by that many worker
+                 processes, whose CPU time does not count either
+
+Example:
+
+    python benchmarks/benchmark.py --devices 2000 --latency 0.02 --jitter 0.01
+
+The devices listen on 127.0.1.0/16 port 80 by default, which needs root on
+most systems; pass --port 8080 otherwise.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+INTEGRATION = ROOT / "custom_components" / "mystrom_switch"
+SCENARIOS = ("poll", "command", "integration")
+
+
+def percentiles(samples: list[float]) -> dict[str, float | None]:
+    """Return p50/p90/p99/max of latencies in ms."""
+    if not samples:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def rank(share: float) -> float:
+        index = min(len(ordered) - 1, int(share * len(ordered)))
+        return round(ordered[index] * 1000, 2)
+
+    return {"p50": rank(0.5), "p90": rank(0.9), "p99": rank(0.99), "max": rank(1.0)}
+
+
+async def start_fake_devices(args: argparse.Namespace) -> asyncio.subprocess.Process:
+    """Start the simulated devices and wait until they answer."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        str(Path(__file__).with_name("fake_device.py")),
+        f"--devices={args.devices}",
+        f"--port={args.port}",
+        f"--latency={args.latency}",
+        f"--jitter={args.jitter}",
+        f"--drop={args.drop}",
+        f"--hang={args.hang}",
+        stdout=asyncio.subprocess.PIPE,
+    )
+    assert process.stdout is not None
+    line = await process.stdout.readline()
+    if not line.startswith(b"ready"):
+        raise RuntimeError("fake devices did not start")
+    return process
+
+
+def device_hosts(args: argparse.Namespace) -> list[str]:
+    """Return the hosts of the simulated devices, see fake_device.py."""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from fake_device import DEFAULT_PORT, FIRST_ADDRESS
+
+    hosts = [str(FIRST_ADDRESS + index) for index in range(args.devices)]
+    if args.port != DEFAULT_PORT:
+        hosts = [f"{host}:{args.port}" for host in hosts]
+    return hosts
+
+
+async def bench_poll(args: argparse.Namespace, hosts: list[str]) -> dict[str, Any]:
+    """Poll all devices as fast as the concurrency allows."""
+    sys.path.insert(0, str(INTEGRATION))
+    from mystrom_api import MyStromAPI, MyStromTransport
+
+    transport = MyStromTransport()
+    # No freshness TTL, every poll has to reach the device
+    apis = [
+        MyStromAPI(host, transport.session, transport.timeout, state_ttl=0)
+        for host in hosts
+    ]
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.monotonic() + args.duration
+    # Every device is polled by exactly one worker: get_state coalesces
+    # concurrent callers, which would count one request several times
+    workers = min(args.concurrency, len(apis))
+
+    async def worker(index: int) -> None:
+        nonlocal errors
+        own = apis[index::workers]
+        while time.monotonic() < deadline:
+            for api in own:
+                start = time.monotonic()
+                try:
+                    await api.get_state()
+                except Exception:  # pylint: disable=broad-except
+                    errors += 1
+                else:
+                    latencies.append(time.monotonic() - start)
+                if time.monotonic() >= deadline:
+                    break
+
+    cpu = time.process_time()
+    start = time.monotonic()
+    await asyncio.gather(*(worker(index) for index in range(workers)))
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu
+    result = {
+        "polls": len(latencies),
+        "errors": errors,
+        "polls_per_second": round(len(latencies) / elapsed, 1),
+        "cpu_per_poll_us": round(cpu / max(len(latencies), 1) * 1e6, 1),
+        "latency_ms": percentiles(latencies),
+        "transport": transport.as_dict(),
+    }
+    await transport.close()
+    return result
+
+
+async def bench_command(args: argparse.Namespace, hosts: list[str]) -> dict[str, Any]:
+    """Send relay commands to random devices."""
+    sys.path.insert(0, str(INTEGRATION))
+    from mystrom_api import MyStromAPI, MyStromTransport
+
+    transport = MyStromTransport()
+    apis = [MyStromAPI(host, transport.session, transport.timeout) for host in hosts]
+    latencies: list[float] = []
+    failures = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def command() -> None:
+        nonlocal failures
+        api = random.choice(apis)
+        async with semaphore:
+            start = time.monotonic()
+            if await random.choice((api.turn_on, api.turn_off, api.toggle))():
+                latencies.append(time.monotonic() - start)
+            else:
+                failures += 1
+
+    start = time.monotonic()
+    await asyncio.gather(*(command() for _ in range(args.commands)))
+    elapsed = time.monotonic() - start
+    result = {
+        "commands": args.commands,
+        "failures": failures,
+        "commands_per_second": round(args.commands / elapsed, 1),
+        "sent": sum(api.commands.sent for api in apis),
+        "latency_ms": percentiles(latencies),
+    }
+    await transport.close()
+    return result
+
+
+async def bench_integration(
+    args: argparse.Namespace, hosts: list[str]
+) -> dict[str, Any]:
+    """Run coordinators under the poll scheduler in a Home Assistant core."""
+    try:
+        from homeassistant.config_entries import ConfigEntry
+        from homeassistant.const import CONF_HOST
+        from homeassistant.core import HomeAssistant
+    except ImportError:
+        return {"skipped": "homeassistant is not installed"}
+
+    sys.path.insert(0, str(ROOT))
+    from custom_components.mystrom_switch.const import DOMAIN
+    from custom_components.mystrom_switch.coordinator import (
+        MyStromDataUpdateCoordinator,
+    )
+    from custom_components.mystrom_switch.mystrom_api import (
+        MyStromAPI,
+        MyStromTransport,
+    )
+    from custom_components.mystrom_switch.scheduler import (
+        MyStromPollScheduler,
+        access_point_group,
+    )
+    from custom_components.mystrom_switch.worker import MyStromPollWorkers
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        transport = MyStromTransport()
+        scheduler = MyStromPollScheduler(hass)
+        workers = MyStromPollWorkers(hass, args.workers) if args.workers else None
+
+        # Everything an entry keeps alive: API client, coordinator with its
+        # sample and energy state, and its slot in the schedule
+        gc.collect()
+        tracemalloc.start()
+        coordinators = []
+        for host in hosts:
+            entry = ConfigEntry(
+                version=1,
+                minor_version=1,
+                domain=DOMAIN,
+                title=host,
+                data={CONF_HOST: host},
+                source="user",
+                options={},
+                unique_id=host,
+            )
+            api = MyStromAPI(host, transport.session, transport.timeout)
+            coordinator = MyStromDataUpdateCoordinator(
+                hass, entry, api, args.scan_interval
+            )
+            if workers is not None:
+                coordinator.async_use_worker(workers)
+            await coordinator.async_refresh()
+            scheduler.async_add(
+                entry.entry_id,
+                coordinator,
+                access_point_group(host),
+                scheduled=workers is None,
+            )
+            coordinators.append(coordinator)
+        gc.collect()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        refreshes = 0
+
+        def count() -> None:
+            nonlocal refreshes
+            refreshes += 1
+
+        listeners = [
+            coordinator.async_add_listener(count) for coordinator in coordinators
+        ]
+        cpu = time.process_time()
+        start = time.monotonic()
+        await asyncio.sleep(args.duration)
+        elapsed = time.monotonic() - start
+        cpu = time.process_time() - cpu
+
+        for remove in listeners:
+            remove()
+        scheduler.async_shutdown()
+        if workers is not None:
+            await workers.async_shutdown()
+        drift = max(
+            (coordinator.poll_drift.percentile(0.95) or 0.0)
+            for coordinator in coordinators
+        )
+        failed = sum(
+            not coordinator.last_update_success for coordinator in coordinators
+        )
+        await transport.close()
+        await hass.async_stop(force=True)
+
+    return {
+        "entries": len(coordinators),
+        "workers": args.workers,
+        "refreshes": refreshes,
+        "refreshes_per_second": round(refreshes / elapsed, 1),
+        "failed_entries": failed,
+        "cpu_per_device_ms_per_s": round(cpu / elapsed / len(hosts) * 1000, 4),
+        "cpu_share": round(cpu / elapsed, 3),
+        "memory_per_entry_kib": round(memory / len(hosts) / 1024, 1),
+        "worst_poll_drift_p95_ms": round(drift * 1000, 1),
+    }
+
+
+async def async_main(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the selected scenarios."""
+    # Every device needs a socket, and the fake devices run in another process
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    hosts = device_hosts(args)
+    process = await start_fake_devices(args)
+    results: dict[str, Any] = {
+        "devices": args.devices,
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "drop": args.drop,
+        "hang": args.hang,
+    }
+    benches = {
+        "poll": bench_poll,
+        "command": bench_command,
+        "integration": bench_integration,
+    }
+    try:
+        for scenario in args.scenarios:
+            results[scenario] = await benches[scenario](args, hosts)
+    finally:
+        process.terminate()
+        await process.wait()
+    return results
+
+
+def main() -> None:
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "scenarios", nargs="*", default=list(SCENARIOS), help=", ".join(SCENARIOS)
+    )
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--commands", type=int, default=2000)
+    parser.add_argument("--scan-interval", type=int, default=10)
+    parser.add_argument(
+        "--workers", type=int, default=0, help="poll worker processes"
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--hang", type=float, default=0.0)
+    args = parser.parse_args()
+    if unknown := set(args.scenarios) - set(SCENARIOS):
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    print(json.dumps(asyncio.run(async_main(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Simulated myStrom WiFi Switches for offline benchmarks.
+
+A single aiohttp server answers for any number of devices. Each device has
+its own loopback address (127.0.1.1, 127.0.1.2, ...), and requests are told
+apart by the local address the client connected to, so thousands of devices
+share one listening socket. Linux routes all of 127.0.0.0/8 to the loopback
+interface; other systems need the addresses configured as aliases.
+
+Every device implements /report, /relay, /toggle, /info and the action URL
+endpoint /api/v1/device/{mac}. Latency, jitter, dropped connections and
+requests that never get an answer can be configured.
+
+Run standalone:
+
+    python benchmarks/fake_device.py --devices 1000 --latency 0.02 --drop 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import ipaddress
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+_LOGGER = logging.getLogger(__name__)
+
+FIRST_ADDRESS = ipaddress.ip_address("127.0.1.1")
+DEFAULT_PORT = 80
+# Requests picked to time out are held for this long, far beyond any client
+# timeout
+HANG_TIME = 300
+
+
+@dataclass
+class FakeDevice:
+    """State of one simulated switch."""
+
+    host: str
+    mac: str
+    relay: bool = True
+    load: float = 0.0
+    temperature: float = 21.0
+    boot_id: str = field(default_factory=lambda: f"{random.getrandbits(32):08x}")
+    booted_at: float = field(default_factory=time.monotonic)
+    energy: float = 0.0
+    measured_at: float = field(default_factory=time.monotonic)
+    actions: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def power(self) -> float:
+        """Return the current power draw in W."""
+        if not self.relay or not self.load:
+            return 0.0
+        return round(self.load * random.uniform(0.97, 1.03), 2)
+
+    def measure(self) -> float:
+        """Advance the energy counter, return the power drawn meanwhile."""
+        now = time.monotonic()
+        power = self.power
+        self.energy += power * (now - self.measured_at)
+        self.measured_at = now
+        return power
+
+    def report(self) -> dict[str, Any]:
+        """Return the /report response."""
+        power = self.measure()
+        return {
+            "power": power,
+            "Ws": power,
+            "relay": self.relay,
+            "temperature": round(self.temperature + random.uniform(-0.2, 0.2), 2),
+            "energy_since_boot": round(self.energy, 2),
+            "time_since_boot": int(time.monotonic() - self.booted_at),
+            "boot_id": self.boot_id,
+        }
+
+    def info(self) -> dict[str, Any]:
+        """Return the /info response."""
+        return {
+            "version": "3.82.60",
+            "mac": self.mac,
+            "type": 107,
+            "name": "",
+            "ip": self.host,
+            "mask": "255.0.0.0",
+            "gw": "127.0.0.1",
+            "dns": "127.0.0.1",
+            "static": False,
+            "connected": True,
+        }
+
+
+class FakeDeviceServer:
+    """Serve a fleet of simulated myStrom switches."""
+
+    def __init__(
+        self,
+        devices: int,
+        port: int = DEFAULT_PORT,
+        bind: str = "0.0.0.0",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        drop: float = 0.0,
+        hang: float = 0.0,
+        load: float = 60.0,
+    ) -> None:
+        """Initialize the server."""
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.drop = drop
+        self.hang = hang
+        self.requests = 0
+        self.devices: dict[str, FakeDevice] = {}
+        for index in range(devices):
+            host = str(FIRST_ADDRESS + index)
+            self.devices[host] = FakeDevice(
+                host=host,
+                mac=f"64B473{index:06X}",
+                load=load * random.uniform(0.5, 1.5) if index % 3 else 0.0,
+            )
+        self._bind = bind
+        self._runner: web.AppRunner | None = None
+        self._session: ClientSession | None = None
+
+    @property
+    def hosts(self) -> list[str]:
+        """Return the host to use for each device."""
+        if self.port == DEFAULT_PORT:
+            return list(self.devices)
+        return [f"{host}:{self.port}" for host in self.devices]
+
+    async def start(self) -> None:
+        """Start answering requests."""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/report", self._report)
+        app.router.add_get("/relay", self._relay)
+        app.router.add_get("/toggle", self._toggle)
+        app.router.add_get("/info", self._info)
+        app.router.add_post("/api/v1/device/{mac}", self._set_actions)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._bind, self.port, backlog=4096).start()
+        self._session = ClientSession(timeout=ClientTimeout(total=5))
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._session is not None:
+            await self._session.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    @web.middleware
+    async def _middleware(
+        self, request: web.Request, handler: Any
+    ) -> web.StreamResponse:
+        """Resolve the device and apply the simulated network conditions."""
+        self.requests += 1
+        transport = request.transport
+        sockname = transport.get_extra_info("sockname") if transport else None
+        if sockname is None or (device := self.devices.get(sockname[0])) is None:
+            raise web.HTTPNotFound
+        request["device"] = device
+
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        roll = random.random()
+        if roll < self.hang:
+            delay = HANG_TIME
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if roll >= 1 - self.drop and request.transport is not None:
+            # Hang up without an answer
+            request.transport.close()
+            return web.Response()
+        return await handler(request)
+
+    async def _report(self, request: web.Request) -> web.Response:
+        """Handle /report."""
+        return web.json_response(request["device"].report())
+
+    async def _relay(self, request: web.Request) -> web.Response:
+        """Handle /relay?state=0|1."""
+        state = request.query.get("state")
+        if state not in ("0", "1"):
+            raise web.HTTPBadRequest
+        self._switch(request["device"], state == "1")
+        return web.Response()
+
+    async def _toggle(self, request: web.Request) -> web.Response:
+        """Handle /toggle."""
+        device = request["device"]
+        self._switch(device, not device.relay)
+        return web.json_response({"relay": device.relay})
+
+    async def _info(self, request: web.Request) -> web.Response:
+        """Handle /info."""
+        return web.json_response(request["device"].info())
+
+    async def _set_actions(self, request: web.Request) -> web.Response:
+        """Handle the action URL configuration."""
+        device = request["device"]
+        if request.match_info["mac"] != device.mac:
+            raise web.HTTPNotFound
+        device.actions.update(await request.post())
+        return web.Response()
+
+    def _switch(self, device: FakeDevice, relay: bool) -> None:
+        """Switch a device and call its action URL."""
+        if device.relay == relay:
+            return
+        device.measure()
+        device.relay = relay
+        if (action := device.actions.get("on" if relay else "off")) is not None:
+            asyncio.get_running_loop().create_task(self._call_action(action))
+
+    async def _call_action(self, action: str) -> None:
+        """Call a myStrom action URL like get://host:port/path."""
+        if not action.startswith("get://") or self._session is None:
+            return
+        try:
+            async with self._session.get(f"http://{action[6:]}") as response:
+                await response.read()
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.debug("Action URL %s failed: %s", action, err)
+
+
+async def _async_main(args: argparse.Namespace) -> None:
+    """Run the server until interrupted."""
+    server = FakeDeviceServer(
+        args.devices,
+        port=args.port,
+        bind=args.bind,
+        latency=args.latency,
+        jitter=args.jitter,
+        drop=args.drop,
+        hang=args.hang,
+    )
+    await server.start()
+    # The benchmark waits for this line before it starts
+    print(f"ready {len(server.devices)} {server.port}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    """Parse the command line and run the server."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--bind", default="0.0.0.0")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--drop", type=float, default=0.0, help="share of dropped connections"
+    )
+    parser.add_argument(
+        "--hang", type=float, default=0.0, help="share of requests never answered"
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(_async_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
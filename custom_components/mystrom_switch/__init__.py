@@ -2,61 +2,310 @@
 from __future__ import annotations
 
 import logging
-from datetime import timedelta
+from typing import Any
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_HOST, Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.const import (
+    CONF_HOST,
+    EVENT_HOMEASSISTANT_CLOSE,
+    EVENT_HOMEASSISTANT_STOP,
+    Platform,
+)
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import ConfigType
 
-from .const import CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL, DOMAIN
-from .mystrom_api import MyStromAPI
+from .const import (
+    CACHE_STORAGE_KEY,
+    CONF_ADAPTIVE,
+    CONF_CYCLE_DETECTION,
+    CONF_CYCLE_END_HOLD,
+    CONF_CYCLE_END_POWER,
+    CONF_CYCLE_START_HOLD,
+    CONF_CYCLE_START_POWER,
+    CONF_ENERGY_DEADBAND,
+    CONF_IMPORT_STATISTICS,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_POWER_DEADBAND,
+    CONF_PROFILE,
+    CONF_PUSH,
+    CONF_SCAN_INTERVAL,
+    CONF_TEMPERATURE_DEADBAND,
+    CONF_WORKER,
+    DATA_LISTENERS,
+    DATA_SCHEDULER,
+    DATA_TRANSPORT,
+    DATA_WORKERS,
+    DEFAULT_ADAPTIVE,
+    DEFAULT_CYCLE_DETECTION,
+    DEFAULT_CYCLE_END_HOLD,
+    DEFAULT_CYCLE_END_POWER,
+    DEFAULT_CYCLE_START_HOLD,
+    DEFAULT_CYCLE_START_POWER,
+    DEFAULT_DEADBAND,
+    DEFAULT_IMPORT_STATISTICS,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_MIN_SCAN_INTERVAL,
+    DEFAULT_PROFILE,
+    DEFAULT_PUSH,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_WORKER,
+    DOMAIN,
+    ENERGY_STORAGE_KEY,
+    PROFILES,
+    STATISTICS_STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from .coordinator import MyStromDataUpdateCoordinator
+from .cycles import CycleDetector
+from .energy_statistics import EnergyStatisticsImporter
+from .mystrom_api import MyStromAPI, MyStromTransport
+from .push import async_setup_push
+from .scheduler import MyStromPollScheduler, access_point_group
+from .services import async_setup_services
+from .worker import MyStromPollWorkers
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS: list[Platform] = [Platform.SWITCH, Platform.SENSOR]
 
+DEADBAND_OPTIONS = (
+    CONF_POWER_DEADBAND,
+    CONF_ENERGY_DEADBAND,
+    CONF_TEMPERATURE_DEADBAND,
+)
+# Options applied to the running entry, any other change reloads it
+LIVE_OPTIONS = {
+    CONF_PROFILE,
+    CONF_SCAN_INTERVAL,
+    CONF_ADAPTIVE,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_MAX_SCAN_INTERVAL,
+    *DEADBAND_OPTIONS,
+}
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the myStrom Switch integration."""
+    async_setup_services(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up myStrom Switch from a config entry."""
+    _async_move_scan_interval(hass, entry)
     host = entry.data[CONF_HOST]
-    scan_interval = entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
-
-    session = async_get_clientsession(hass)
-    api = MyStromAPI(host, session)
-
-    async def async_update_data():
-        """Fetch data from API."""
-        try:
-            return await api.get_state()
-        except Exception as err:
-            raise UpdateFailed(f"Error communicating with API: {err}") from err
-
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name=f"myStrom Switch {host}",
-        update_method=async_update_data,
-        update_interval=timedelta(seconds=scan_interval),
-    )
+    scan_interval = entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+
+    domain_data = _async_setup_domain_data(hass)
+    transport: MyStromTransport = domain_data[DATA_TRANSPORT]
+    scheduler: MyStromPollScheduler = domain_data[DATA_SCHEDULER]
+
+    api = MyStromAPI(host, transport.session, transport.timeout)
 
-    await coordinator.async_config_entry_first_refresh()
+    coordinator = MyStromDataUpdateCoordinator(hass, entry, api, scan_interval)
+    await coordinator.async_load_energy()
+    if entry.options.get(CONF_WORKER, DEFAULT_WORKER):
+        entry.async_on_unload(coordinator.async_use_worker(_async_get_workers(hass)))
+
+    # Come up from the last known data right away and replace it in the
+    # background. Only a device seen for the first time is waited for.
+    if await coordinator.async_load_cache():
+        scheduler.async_request_batch_refresh(entry.entry_id)
+    else:
+        await coordinator.async_config_entry_first_refresh()
 
-    hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
         "coordinator": coordinator,
         "api": api,
+        "options": dict(entry.options),
     }
 
+    if entry.options.get(CONF_CYCLE_DETECTION, DEFAULT_CYCLE_DETECTION):
+        coordinator.async_enable_cycles(
+            CycleDetector(
+                entry.options.get(CONF_CYCLE_START_POWER, DEFAULT_CYCLE_START_POWER),
+                entry.options.get(CONF_CYCLE_END_POWER, DEFAULT_CYCLE_END_POWER),
+                entry.options.get(CONF_CYCLE_START_HOLD, DEFAULT_CYCLE_START_HOLD),
+                entry.options.get(CONF_CYCLE_END_HOLD, DEFAULT_CYCLE_END_HOLD),
+            )
+        )
+
+    _async_apply_profile(hass, entry)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+
+    if entry.options.get(CONF_IMPORT_STATISTICS, DEFAULT_IMPORT_STATISTICS):
+        importer = EnergyStatisticsImporter(hass, entry, coordinator)
+        entry.async_on_unload(await importer.async_start())
+
+    entry.async_on_unload(
+        scheduler.async_add(
+            entry.entry_id,
+            coordinator,
+            access_point_group(host),
+            scheduled=coordinator.worker is None,
+        )
+    )
+
+    entry.async_create_background_task(
+        hass, _async_update_info(coordinator), f"{coordinator.name} info"
+    )
+    if entry.options.get(CONF_PUSH, DEFAULT_PUSH):
+        entry.async_create_background_task(
+            hass, async_setup_push(hass, entry, coordinator), f"{coordinator.name} push"
+        )
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options to the running entry.
+
+    A new profile, poll interval or deadband is applied without a reload,
+    any other change reloads the entry.
+    """
+    data = hass.data[DOMAIN][entry.entry_id]
+    previous, data["options"] = data["options"], dict(entry.options)
+    changed = {
+        key
+        for key in previous.keys() | entry.options.keys()
+        if previous.get(key) != entry.options.get(key)
+    }
+    if changed - LIVE_OPTIONS:
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    _async_apply_profile(hass, entry)
+
+
+@callback
+def _async_move_scan_interval(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Move the poll interval set up by earlier versions into the options."""
+    if CONF_SCAN_INTERVAL not in entry.data:
+        return
+    data = dict(entry.data)
+    scan_interval = data.pop(CONF_SCAN_INTERVAL)
+    hass.config_entries.async_update_entry(
+        entry,
+        data=data,
+        options={CONF_SCAN_INTERVAL: scan_interval, **entry.options},
+    )
+
+
+@callback
+def _async_apply_profile(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply the poll interval, request timeout and deadbands of the profile.
+
+    Without a profile, the settings of the entry apply. The entry's poll
+    interval is kept either way, for when the profile is cleared.
+    """
+    domain_data = hass.data[DOMAIN]
+    coordinator: MyStromDataUpdateCoordinator = domain_data[entry.entry_id][
+        "coordinator"
+    ]
+    adaptive_bounds = None
+    if entry.options.get(CONF_ADAPTIVE, DEFAULT_ADAPTIVE):
+        adaptive_bounds = (
+            entry.options.get(CONF_MIN_SCAN_INTERVAL, DEFAULT_MIN_SCAN_INTERVAL),
+            entry.options.get(CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+        )
+    coordinator.async_set_scan_interval(
+        entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL), adaptive_bounds
+    )
+    profile = PROFILES.get(entry.options.get(CONF_PROFILE, DEFAULT_PROFILE))
+    if profile is None:
+        coordinator.async_set_profile_interval(None)
+        coordinator.async_set_request_timeout(None)
+        coordinator.async_set_deadbands(
+            {
+                option: entry.options.get(option, DEFAULT_DEADBAND)
+                for option in DEADBAND_OPTIONS
+            }
+        )
+    else:
+        coordinator.async_set_profile_interval(profile["scan_interval"])
+        coordinator.async_set_request_timeout(profile["timeout"])
+        coordinator.async_set_deadbands(
+            {option: profile["deadband"] for option in DEADBAND_OPTIONS}
+        )
+    domain_data[DATA_SCHEDULER].async_reschedule(entry.entry_id)
+
+
+async def _async_update_info(coordinator: MyStromDataUpdateCoordinator) -> None:
+    """Refresh the cached device information."""
+    try:
+        await coordinator.async_update_info()
+    except Exception as err:  # pylint: disable=broad-except
+        _LOGGER.debug("Could not fetch info of %s: %s", coordinator.api.host, err)
+
+
+@callback
+def _async_setup_domain_data(hass: HomeAssistant) -> dict[str, Any]:
+    """Create the objects shared by all config entries on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_TRANSPORT not in domain_data:
+        transport = domain_data[DATA_TRANSPORT] = MyStromTransport()
+        scheduler = domain_data[DATA_SCHEDULER] = MyStromPollScheduler(hass)
+
+        async def _async_close_transport(event: Event) -> None:
+            await transport.close()
+
+        domain_data[DATA_LISTENERS] = [
+            hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_STOP, scheduler.async_shutdown
+            ),
+            hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_CLOSE, _async_close_transport
+            ),
+        ]
+    return domain_data
+
+
+async def _async_close_domain_data(hass: HomeAssistant) -> None:
+    """Close the objects shared by the config entries after the last one."""
+    domain_data = hass.data[DOMAIN]
+    for unsub in domain_data.pop(DATA_LISTENERS):
+        unsub()
+    domain_data.pop(DATA_SCHEDULER).async_shutdown()
+    await domain_data.pop(DATA_TRANSPORT).close()
+    if (workers := domain_data.pop(DATA_WORKERS, None)) is not None:
+        await workers.async_shutdown()
+
+
+@callback
+def _async_get_workers(hass: HomeAssistant) -> MyStromPollWorkers:
+    """Return the pool of poll workers, creating it on first use."""
+    domain_data = hass.data[DOMAIN]
+    if DATA_WORKERS not in domain_data:
+        workers = domain_data[DATA_WORKERS] = MyStromPollWorkers(hass)
+        domain_data[DATA_LISTENERS].append(
+            hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, workers.async_shutdown)
+        )
+    return domain_data[DATA_WORKERS]
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the persisted data of a config entry."""
+    for key in (CACHE_STORAGE_KEY, ENERGY_STORAGE_KEY, STATISTICS_STORAGE_KEY):
+        await Store(
+            hass, STORAGE_VERSION, key.format(entry_id=entry.entry_id)
+        ).async_remove()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         hass.data[DOMAIN].pop(entry.entry_id)
+        if not any(
+            other.state in (ConfigEntryState.LOADED, ConfigEntryState.SETUP_IN_PROGRESS)
+            for other in hass.config_entries.async_entries(DOMAIN)
+            if other.entry_id != entry.entry_id
+        ):
+            await _async_close_domain_data(hass)
 
     return unload_ok
@@ -1,6 +1,7 @@
 """Config flow for myStrom Switch integration."""
 from __future__ import annotations
 
+import ipaddress
 import logging
 from typing import Any
 
@@ -8,27 +9,183 @@ import aiohttp
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.components import dhcp, zeroconf
+from homeassistant.components import dhcp, network, zeroconf
 from homeassistant.const import CONF_HOST, CONF_NAME
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers import selector
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
-from .const import CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL, DOMAIN
+from .const import (
+    CONF_ADAPTIVE,
+    CONF_CYCLE_DETECTION,
+    CONF_CYCLE_END_HOLD,
+    CONF_CYCLE_END_POWER,
+    CONF_CYCLE_START_HOLD,
+    CONF_CYCLE_START_POWER,
+    CONF_ENERGY_DEADBAND,
+    CONF_IMPORT_STATISTICS,
+    CONF_MAC,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_MAX_WRITE_INTERVAL,
+    CONF_MIN_SCAN_INTERVAL,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_NETWORKS,
+    CONF_OPTIMISTIC,
+    CONF_POWER_DEADBAND,
+    CONF_PROFILE,
+    CONF_PUSH,
+    CONF_SCAN_INTERVAL,
+    CONF_STATISTICS_WINDOWS,
+    CONF_SWITCH_ATTRIBUTES,
+    CONF_TEMPERATURE_DEADBAND,
+    CONF_WORKER,
+    DATA_INFO_CACHE,
+    DEFAULT_ADAPTIVE,
+    DEFAULT_CYCLE_DETECTION,
+    DEFAULT_CYCLE_END_HOLD,
+    DEFAULT_CYCLE_END_POWER,
+    DEFAULT_CYCLE_START_HOLD,
+    DEFAULT_CYCLE_START_POWER,
+    DEFAULT_DEADBAND,
+    DEFAULT_IMPORT_STATISTICS,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_MAX_WRITE_INTERVAL,
+    DEFAULT_MIN_SCAN_INTERVAL,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_OPTIMISTIC,
+    DEFAULT_PROFILE,
+    DEFAULT_PUSH,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_STATISTICS_WINDOWS,
+    DEFAULT_SWITCH_ATTRIBUTES,
+    DEFAULT_WORKER,
+    DOMAIN,
+    INFO_CACHE_SAVE_DELAY,
+    INFO_CACHE_STORAGE_KEY,
+    PROFILE_CUSTOM,
+    PROFILES,
+    STORAGE_VERSION,
+)
+from .discovery import InfoCache, InvalidNetworks, async_scan, parse_networks
 from .mystrom_api import MyStromAPI
+from .store import ThrottledStore
 
 _LOGGER = logging.getLogger(__name__)
 
+# An absolute deadband ("0.5") or one relative to the last value ("5%")
+DEADBAND = vol.Match(r"^\d+(\.\d+)?%?$")
+
+SCAN_INTERVAL = vol.All(vol.Coerce(int), vol.Range(min=5, max=300))
+
+PROFILE_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[PROFILE_CUSTOM, *PROFILES],
+        mode=selector.SelectSelectorMode.LIST,
+        translation_key=CONF_PROFILE,
+    )
+)
+
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_HOST): str,
-        vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): vol.All(
-            vol.Coerce(int), vol.Range(min=5, max=300)
-        ),
+        vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): SCAN_INTERVAL,
+    }
+)
+
+OPTIONS_POLLING_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_PROFILE, default=DEFAULT_PROFILE): PROFILE_SELECTOR,
+        vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): SCAN_INTERVAL,
+        vol.Optional(CONF_ADAPTIVE, default=DEFAULT_ADAPTIVE): bool,
+        vol.Optional(
+            CONF_MIN_SCAN_INTERVAL, default=DEFAULT_MIN_SCAN_INTERVAL
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=300)),
+        vol.Optional(
+            CONF_MAX_SCAN_INTERVAL, default=DEFAULT_MAX_SCAN_INTERVAL
+        ): vol.All(vol.Coerce(int), vol.Range(min=5, max=3600)),
+        vol.Optional(CONF_PUSH, default=DEFAULT_PUSH): bool,
+        vol.Optional(CONF_WORKER, default=DEFAULT_WORKER): bool,
+    }
+)
+
+OPTIONS_SENSORS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_OPTIMISTIC, default=DEFAULT_OPTIMISTIC): bool,
+        vol.Optional(
+            CONF_STATISTICS_WINDOWS,
+            default=", ".join(str(window) for window in DEFAULT_STATISTICS_WINDOWS),
+        ): str,
+        vol.Optional(CONF_POWER_DEADBAND, default=DEFAULT_DEADBAND): DEADBAND,
+        vol.Optional(CONF_ENERGY_DEADBAND, default=DEFAULT_DEADBAND): DEADBAND,
+        vol.Optional(CONF_TEMPERATURE_DEADBAND, default=DEFAULT_DEADBAND): DEADBAND,
+        vol.Optional(
+            CONF_MIN_WRITE_INTERVAL, default=DEFAULT_MIN_WRITE_INTERVAL
+        ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+        vol.Optional(
+            CONF_MAX_WRITE_INTERVAL, default=DEFAULT_MAX_WRITE_INTERVAL
+        ): vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+        vol.Optional(
+            CONF_SWITCH_ATTRIBUTES, default=DEFAULT_SWITCH_ATTRIBUTES
+        ): bool,
+        vol.Optional(
+            CONF_IMPORT_STATISTICS, default=DEFAULT_IMPORT_STATISTICS
+        ): bool,
+    }
+)
+
+OPTIONS_CYCLES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_CYCLE_DETECTION, default=DEFAULT_CYCLE_DETECTION): bool,
+        vol.Optional(
+            CONF_CYCLE_START_POWER, default=DEFAULT_CYCLE_START_POWER
+        ): vol.All(vol.Coerce(float), vol.Range(min=0, max=4000)),
+        vol.Optional(
+            CONF_CYCLE_END_POWER, default=DEFAULT_CYCLE_END_POWER
+        ): vol.All(vol.Coerce(float), vol.Range(min=0, max=4000)),
+        vol.Optional(
+            CONF_CYCLE_START_HOLD, default=DEFAULT_CYCLE_START_HOLD
+        ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+        vol.Optional(
+            CONF_CYCLE_END_HOLD, default=DEFAULT_CYCLE_END_HOLD
+        ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
     }
 )
 
 
+def parse_statistics_windows(value: str) -> list[int]:
+    """Parse a comma separated list of window lengths in minutes."""
+    try:
+        windows = sorted({int(part) for part in value.split(",") if part.strip()})
+    except ValueError as err:
+        raise InvalidStatisticsWindows from err
+    if any(not 1 <= window <= 1440 for window in windows):
+        raise InvalidStatisticsWindows
+    return windows
+
+
+async def _async_info_cache(hass: HomeAssistant) -> InfoCache:
+    """Return the /info cache shared by all discovery flows.
+
+    The cache is persisted, so a restart does not ask every announced
+    device again.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_INFO_CACHE not in domain_data:
+        store: ThrottledStore[dict[str, Any]] = ThrottledStore(
+            hass, STORAGE_VERSION, INFO_CACHE_STORAGE_KEY
+        )
+
+        @callback
+        def _async_save() -> None:
+            store.async_delay_save(cache.as_dict, INFO_CACHE_SAVE_DELAY)
+
+        cache = domain_data[DATA_INFO_CACHE] = InfoCache(on_change=_async_save)
+        if (stored := await store.async_load()) is not None:
+            cache.restore(stored)
+    return domain_data[DATA_INFO_CACHE]
+
+
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
     """Validate the user input allows us to connect.
 
@@ -61,10 +218,24 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self._discovered_host: str | None = None
         self._discovered_mac: str | None = None
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlow:
+        """Return the options flow."""
+        return OptionsFlow(config_entry)
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Handle the initial step."""
+        """Let the user enter a device or scan the network for devices."""
+        return self.async_show_menu(step_id="user", menu_options=["manual", "scan"])
+
+    async def async_step_manual(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle a device entered by the user."""
         errors: dict[str, str] = {}
 
         if user_input is not None:
@@ -90,21 +261,92 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 return await self.async_step_name()
 
         return self.async_show_form(
-            step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
+            step_id="manual", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
 
+    async def async_step_scan(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Sweep IP ranges and offer every device found for setup."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            try:
+                hosts = parse_networks(user_input[CONF_NETWORKS])
+            except InvalidNetworks:
+                errors["base"] = "invalid_networks"
+            else:
+                configured = {
+                    entry.data.get(CONF_HOST)
+                    for entry in self._async_current_entries(include_ignore=False)
+                }
+                found = await async_scan(
+                    async_get_clientsession(self.hass),
+                    [host for host in hosts if host not in configured],
+                )
+                cache = await _async_info_cache(self.hass)
+                for host, info in found.items():
+                    cache.set(host, info)
+                    self.hass.async_create_task(
+                        self.hass.config_entries.flow.async_init(
+                            DOMAIN,
+                            context={
+                                "source": config_entries.SOURCE_INTEGRATION_DISCOVERY
+                            },
+                            data={CONF_HOST: host, CONF_MAC: info["mac"]},
+                        )
+                    )
+                if found:
+                    return self.async_abort(
+                        reason="scan_complete",
+                        description_placeholders={"count": str(len(found))},
+                    )
+                errors["base"] = "no_devices_found"
+
+        default = (
+            user_input[CONF_NETWORKS]
+            if user_input is not None
+            else await self._async_local_networks()
+        )
+        return self.async_show_form(
+            step_id="scan",
+            data_schema=vol.Schema(
+                {vol.Required(CONF_NETWORKS, default=default): str}
+            ),
+            errors=errors,
+        )
+
+    async def _async_local_networks(self) -> str:
+        """Return the IPv4 networks Home Assistant is connected to."""
+        networks = []
+        for adapter in await network.async_get_adapters(self.hass):
+            if not adapter["enabled"]:
+                continue
+            for address in adapter["ipv4"]:
+                net = ipaddress.ip_network(
+                    f"{address['address']}/{address['network_prefix']}", strict=False
+                )
+                if not net.is_loopback:
+                    networks.append(str(net))
+        return ", ".join(networks)
+
     async def async_step_name(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle the name step."""
         if user_input is not None:
-            # Combine data from both steps
-            config_data = self.context["user_input"]
+            # Combine data from both steps, the interval is an option
+            config_data = dict(self.context["user_input"])
             config_data[CONF_NAME] = user_input[CONF_NAME]
+            scan_interval = config_data.pop(CONF_SCAN_INTERVAL)
 
             title = user_input[CONF_NAME] if user_input[CONF_NAME] else "myStrom Switch"
 
-            return self.async_create_entry(title=title, data=config_data)
+            return self.async_create_entry(
+                title=title,
+                data=config_data,
+                options={CONF_SCAN_INTERVAL: scan_interval},
+            )
 
         # Default name suggestion
         suggested_name = f"myStrom Switch"
@@ -122,15 +364,12 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle zeroconf discovery."""
         host = discovery_info.host
 
-        # Try to get MAC address from device info
-        session = async_get_clientsession(self.hass)
-        api = MyStromAPI(host, session)
+        # Announcements of configured devices are answered without I/O
+        self._async_abort_entries_match({CONF_HOST: host})
 
-        try:
-            info = await api.get_info()
-            mac = info.get("mac", host.replace(".", "_"))
-        except Exception:
-            mac = host.replace(".", "_")
+        cache = await _async_info_cache(self.hass)
+        info = await cache.async_get(async_get_clientsession(self.hass), host)
+        mac = info["mac"] if info is not None else host.replace(".", "_")
 
         # Set unique ID to prevent duplicate entries
         await self.async_set_unique_id(mac)
@@ -151,12 +390,12 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # Set unique ID to prevent duplicate entries
         await self.async_set_unique_id(mac)
         self._abort_if_unique_id_configured()
+        self._async_abort_entries_match({CONF_HOST: host})
 
-        # Verify it's a myStrom device by testing connection
-        session = async_get_clientsession(self.hass)
-        api = MyStromAPI(host, session)
-
-        if not await api.test_connection():
+        # Verify it's a myStrom device
+        cache = await _async_info_cache(self.hass)
+        info = await cache.async_get(async_get_clientsession(self.hass), host)
+        if info is None:
             return self.async_abort(reason="cannot_connect")
 
         # Store the discovered host for confirmation step
@@ -164,6 +403,19 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         return await self.async_step_discovery_confirm()
 
+    async def async_step_integration_discovery(
+        self, discovery_info: dict[str, Any]
+    ) -> FlowResult:
+        """Handle a device found by the network scan."""
+        host = discovery_info[CONF_HOST]
+
+        await self.async_set_unique_id(discovery_info[CONF_MAC])
+        self._abort_if_unique_id_configured(updates={CONF_HOST: host})
+
+        self.context["title_placeholders"] = {"host": host}
+
+        return await self.async_step_discovery_confirm()
+
     async def async_step_discovery_confirm(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -172,7 +424,8 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             host = self.context["title_placeholders"]["host"]
             return self.async_create_entry(
                 title="myStrom Switch",
-                data={CONF_HOST: host, CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL},
+                data={CONF_HOST: host},
+                options={CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL},
             )
 
         return self.async_show_form(
@@ -181,5 +434,126 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
 
+class OptionsFlow(config_entries.OptionsFlow):
+    """Change the settings of a myStrom Switch.
+
+    The settings are grouped into menu steps, so manually added and
+    discovered devices are set up the same way. The update listener applies
+    a changed profile or deadband to the running entry; any other change
+    reloads it.
+    """
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self._entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Let the user pick a group of settings."""
+        return self.async_show_menu(
+            step_id="init", menu_options=["polling", "sensors", "cycles"]
+        )
+
+    async def async_step_polling(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the profile, poll intervals, push updates and the poll worker."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            if user_input[CONF_MIN_SCAN_INTERVAL] > user_input[CONF_MAX_SCAN_INTERVAL]:
+                errors["base"] = "invalid_interval_bounds"
+            else:
+                return self._async_save(OPTIONS_POLLING_SCHEMA, user_input)
+        return self._async_show_step(
+            "polling", OPTIONS_POLLING_SCHEMA, user_input, errors
+        )
+
+    async def async_step_sensors(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage switching, statistics, deadbands and write intervals."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            try:
+                windows = parse_statistics_windows(user_input[CONF_STATISTICS_WINDOWS])
+            except InvalidStatisticsWindows:
+                errors["base"] = "invalid_statistics_windows"
+            else:
+                return self._async_save(
+                    OPTIONS_SENSORS_SCHEMA,
+                    user_input,
+                    {CONF_STATISTICS_WINDOWS: windows},
+                )
+        return self._async_show_step(
+            "sensors", OPTIONS_SENSORS_SCHEMA, user_input, errors
+        )
+
+    async def async_step_cycles(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the detection of appliance cycles."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            if user_input[CONF_CYCLE_END_POWER] > user_input[CONF_CYCLE_START_POWER]:
+                errors["base"] = "invalid_cycle_thresholds"
+            else:
+                return self._async_save(OPTIONS_CYCLES_SCHEMA, user_input)
+        return self._async_show_step(
+            "cycles", OPTIONS_CYCLES_SCHEMA, user_input, errors
+        )
+
+    @callback
+    def _async_show_step(
+        self,
+        step_id: str,
+        schema: vol.Schema,
+        user_input: dict[str, Any] | None,
+        errors: dict[str, str],
+    ) -> FlowResult:
+        """Show a step filled with the rejected input or the current options."""
+        return self.async_show_form(
+            step_id=step_id,
+            data_schema=self.add_suggested_values_to_schema(
+                schema, user_input or self._shown_options()
+            ),
+            errors=errors,
+        )
+
+    @callback
+    def _async_save(
+        self,
+        schema: vol.Schema,
+        user_input: dict[str, Any],
+        parsed: dict[str, Any] | None = None,
+    ) -> FlowResult:
+        """Store the settings that differ from what the step showed.
+
+        Defaults the user left alone are not stored, so they do not count
+        as changes that need a reload.
+        """
+        parsed = parsed or {}
+        shown = self._shown_options()
+        options = dict(self._entry.options)
+        for marker in schema.schema:
+            key = marker.schema
+            if user_input[key] != shown.get(key, marker.default()):
+                options[key] = parsed.get(key, user_input[key])
+        return self.async_create_entry(title="", data=options)
+
+    def _shown_options(self) -> dict[str, Any]:
+        """Return the current options as the steps show them."""
+        options = dict(self._entry.options)
+        if CONF_STATISTICS_WINDOWS in options:
+            options[CONF_STATISTICS_WINDOWS] = ", ".join(
+                str(window) for window in options[CONF_STATISTICS_WINDOWS]
+            )
+        return options
+
+
 class CannotConnect(Exception):
     """Error to indicate we cannot connect."""
+
+
+class InvalidStatisticsWindows(Exception):
+    """Error to indicate the statistics windows could not be parsed."""
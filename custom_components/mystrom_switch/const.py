@@ -5,11 +5,156 @@ DOMAIN = "mystrom_switch"
 # Default values
 DEFAULT_SCAN_INTERVAL = 10
 
+# Fleet-wide polling
+DEFAULT_MAX_CONCURRENT_POLLS = 16
+DEFAULT_MAX_POLLS_PER_ACCESS_POINT = 4
+DEFAULT_POLL_JITTER = 0.5
+
+# Switch commands
+DEFAULT_OPTIMISTIC = False
+# Seconds to collect refresh requests (e.g. after commands) into one batch
+BATCH_REFRESH_DELAY = 1.0
+
+# Adaptive polling
+DEFAULT_ADAPTIVE = False
+DEFAULT_MIN_SCAN_INTERVAL = 5
+DEFAULT_MAX_SCAN_INTERVAL = 300
+# Power changes above max(absolute W, relative share) count as activity
+ADAPTIVE_POWER_THRESHOLD = 2.0
+ADAPTIVE_POWER_THRESHOLD_RELATIVE = 0.05
+
+# Energy
+# Samples further apart than this (seconds) are not integrated
+ENERGY_MAX_GAP = 3600
+ENERGY_SAVE_DELAY = 60
+STORAGE_VERSION = 1
+ENERGY_STORAGE_KEY = "mystrom_switch.{entry_id}.energy"
+
+# Last known device data
+CACHE_SAVE_DELAY = 600
+CACHE_STORAGE_KEY = "mystrom_switch.{entry_id}.cache"
+# /info answers of discovered hosts, shared by all entries
+INFO_CACHE_SAVE_DELAY = 600
+INFO_CACHE_STORAGE_KEY = "mystrom_switch.info_cache"
+
+# Rolling statistics
+# Samples kept at least, and at most: one per second over the longest window
+SAMPLE_BUFFER_MIN_SIZE = 64
+SAMPLE_BUFFER_MAX_SIZE = 1440 * 60
+# Window lengths in minutes
+DEFAULT_STATISTICS_WINDOWS = [5, 60]
+
+# State writes
+# Deadbands are absolute ("0.5") or relative to the last written value ("5%")
+DEFAULT_DEADBAND = "0"
+DEFAULT_MIN_WRITE_INTERVAL = 0
+DEFAULT_MAX_WRITE_INTERVAL = 900
+DEFAULT_SWITCH_ATTRIBUTES = True
+
+# Long-term statistics import
+DEFAULT_IMPORT_STATISTICS = False
+# Seconds per bucket
+STATISTICS_BUCKET = 300
+STATISTICS_SAVE_DELAY = 60
+STATISTICS_STORAGE_KEY = "mystrom_switch.{entry_id}.statistics"
+
+# Appliance cycles
+DEFAULT_CYCLE_DETECTION = False
+# A cycle starts above start power (W) held for start hold (s) and ends below
+# the lower end power held for end hold
+DEFAULT_CYCLE_START_POWER = 5.0
+DEFAULT_CYCLE_END_POWER = 2.0
+DEFAULT_CYCLE_START_HOLD = 30
+DEFAULT_CYCLE_END_HOLD = 120
+EVENT_CYCLE_START = "mystrom_switch_cycle_start"
+EVENT_CYCLE_END = "mystrom_switch_cycle_end"
+
+# Bulk switching
+BULK_MAX_CONCURRENT = 32
+BULK_COMMAND_TIMEOUT = 5
+
+# Push updates
+DEFAULT_PUSH = False
+DEFAULT_LIVENESS_INTERVAL = 300
+PUSH_URL = "/api/mystrom_switch/push/{token}"
+
+# Out-of-process polling, sharded over a pool of worker processes
+DEFAULT_WORKER = False
+DEFAULT_WORKER_PROCESSES = 2
+# Seconds to wait for a requested poll, and before restarting a worker
+WORKER_POLL_TIMEOUT = 15
+WORKER_RESTART_DELAY = 5
+# Seconds between watchdog checks, and the poll intervals a host may go
+# without a result (plus the poll timeout) before it is marked failed
+WORKER_WATCHDOG_INTERVAL = 10
+WORKER_WATCHDOG_POLLS = 3
+# Seconds after which an unchanged report from a worker is published anyway,
+# and the precision of the values compared to decide whether it changed
+WORKER_HEARTBEAT = 60
+WORKER_POWER_RESOLUTION = 1
+WORKER_TEMPERATURE_RESOLUTION = 1
+
+# Polling profiles, selected in the options. The custom profile keeps the
+# interval and deadbands of the entry.
+PROFILE_CUSTOM = "custom"
+PROFILE_REALTIME = "realtime"
+PROFILE_NORMAL = "normal"
+PROFILE_ECO = "eco"
+DEFAULT_PROFILE = PROFILE_CUSTOM
+# Poll interval and request timeout in seconds, deadband of the measurements
+PROFILES = {
+    PROFILE_REALTIME: {"scan_interval": 2, "timeout": 3, "deadband": "0"},
+    PROFILE_NORMAL: {"scan_interval": 10, "timeout": 10, "deadband": "0"},
+    PROFILE_ECO: {"scan_interval": 60, "timeout": 10, "deadband": "5%"},
+}
+
 # Configuration
 CONF_MAC = "mac"
+CONF_NETWORKS = "networks"
 CONF_SCAN_INTERVAL = "scan_interval"
+CONF_ADAPTIVE = "adaptive"
+CONF_MIN_SCAN_INTERVAL = "min_scan_interval"
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+CONF_OPTIMISTIC = "optimistic"
+CONF_STATISTICS_WINDOWS = "statistics_windows"
+CONF_POWER_DEADBAND = "power_deadband"
+CONF_ENERGY_DEADBAND = "energy_deadband"
+CONF_TEMPERATURE_DEADBAND = "temperature_deadband"
+CONF_MIN_WRITE_INTERVAL = "min_write_interval"
+CONF_MAX_WRITE_INTERVAL = "max_write_interval"
+CONF_SWITCH_ATTRIBUTES = "switch_attributes"
+CONF_IMPORT_STATISTICS = "import_statistics"
+CONF_PUSH = "push"
+CONF_CYCLE_DETECTION = "cycle_detection"
+CONF_CYCLE_START_POWER = "cycle_start_power"
+CONF_CYCLE_END_POWER = "cycle_end_power"
+CONF_CYCLE_START_HOLD = "cycle_start_hold"
+CONF_CYCLE_END_HOLD = "cycle_end_hold"
+CONF_PUSH_TOKEN = "push_token"
+CONF_PROFILE = "profile"
+CONF_WORKER = "worker"
+
+# hass.data keys
+DATA_SCHEDULER = "scheduler"
+DATA_TRANSPORT = "transport"
+DATA_PUSH = "push"
+DATA_INFO_CACHE = "info_cache"
+DATA_WORKERS = "workers"
+DATA_LISTENERS = "listeners"
+
+# Services
+SERVICE_BULK_SET = "bulk_set"
+SERVICE_SET_PROFILE = "set_profile"
 
 # Attributes
+ATTR_ACTION = "action"
+ATTR_ALL = "all"
+ATTR_ENTRY_ID = "entry_id"
+ATTR_PROFILE = "profile"
 ATTR_POWER = "power"
 ATTR_TEMPERATURE = "temperature"
 ATTR_RELAY = "relay"
+ATTR_STARTED = "started"
+ATTR_DURATION = "duration"
+ATTR_ENERGY = "energy"
+ATTR_PEAK_POWER = "peak_power"
@@ -0,0 +1,427 @@
+"""DataUpdateCoordinator for the myStrom Switch integration."""
+from __future__ import annotations
+
+import dataclasses
+import logging
+import math
+import time
+from datetime import timedelta
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_NAME
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ADAPTIVE_POWER_THRESHOLD,
+    ADAPTIVE_POWER_THRESHOLD_RELATIVE,
+    ATTR_DURATION,
+    ATTR_ENERGY,
+    ATTR_ENTRY_ID,
+    ATTR_PEAK_POWER,
+    ATTR_STARTED,
+    CACHE_SAVE_DELAY,
+    CACHE_STORAGE_KEY,
+    ENERGY_SAVE_DELAY,
+    ENERGY_STORAGE_KEY,
+    EVENT_CYCLE_END,
+    EVENT_CYCLE_START,
+    SAMPLE_BUFFER_MAX_SIZE,
+    SAMPLE_BUFFER_MIN_SIZE,
+    STORAGE_VERSION,
+    WORKER_HEARTBEAT,
+    WORKER_POWER_RESOLUTION,
+    WORKER_TEMPERATURE_RESOLUTION,
+)
+from .cycles import CYCLE_START, CycleDetector
+from .energy import EnergyAccumulator
+from .mystrom_api import (
+    MyStromAPI,
+    MyStromReport,
+    MyStromReportError,
+    WindowedHistogram,
+    request_timeout,
+)
+from .samples import RollingWindow, SampleRingBuffer
+from .store import ThrottledStore
+from .worker import MyStromPollWorkers, PollWorkerSubscription
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_deadband(value: str) -> tuple[float, float]:
+    """Parse a deadband into its (absolute, relative) thresholds.
+
+    "0.5" is an absolute deadband, "5%" one relative to the last value.
+    """
+    value = value.strip()
+    if value.endswith("%"):
+        return 0.0, float(value[:-1]) / 100
+    return float(value), 0.0
+
+
+def _published_state(report: MyStromReport) -> tuple:
+    """Return the values whose change is passed to the entities."""
+    temperature = report.temperature
+    return (
+        report.relay,
+        round(report.power, WORKER_POWER_RESOLUTION),
+        None
+        if temperature is None
+        else round(temperature, WORKER_TEMPERATURE_RESOLUTION),
+    )
+
+
+class MyStromDataUpdateCoordinator(DataUpdateCoordinator[MyStromReport]):
+    """Coordinator holding the /report data of a single myStrom switch.
+
+    The coordinator does not schedule itself. Polling is driven by the shared
+    MyStromPollScheduler, which reads poll_interval to place the device in
+    the fleet-wide schedule. A polling profile overrides the interval of
+    the entry, including adaptive polling, until it is cleared again.
+
+    Every sample is also fed into the energy accumulator, whose state is
+    persisted so it survives restarts, and into the sample history that
+    backs the rolling statistics sensors. With cycle detection enabled, the
+    samples also drive the cycle detector, whose transitions are fired as
+    events.
+
+    The last /report and /info data are cached on disk. At startup the
+    cached report is published right away and flagged as stale until the
+    first live refresh replaces it.
+
+    With a poll worker, the worker polls the device in another process and
+    pushes every report, which goes through the same processing as polled
+    ones. The entities are only notified when the relay, power or
+    temperature changed, or after WORKER_HEARTBEAT seconds. Requested
+    refreshes become immediate polls in the worker.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        api: MyStromAPI,
+        scan_interval: int,
+    ) -> None:
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"myStrom Switch {api.host}",
+            update_interval=None,
+        )
+        self.api = api
+        self._entry = entry
+        self.worker: PollWorkerSubscription | None = None
+        # Monotonic time a worker report was last passed to the entities
+        self._published_at = 0.0
+        self.poll_interval = timedelta(seconds=scan_interval)
+        # Fixed interval of the entry, used when not adaptive
+        self._scan_interval = self.poll_interval
+        self._adaptive_bounds: tuple[timedelta, timedelta] | None = None
+        self._profile_interval: timedelta | None = None
+        # Set when the device pushes its changes and is only polled for liveness
+        self._liveness_only = False
+        # Request timeout of the profile in s, None keeps the API's default
+        self._request_timeout: float | None = None
+        self._default_timeout = api.timeout
+        # Effective deadbands of the sensors by option, set with the profile
+        self.deadbands: dict[str, tuple[float, float]] = {}
+        # Monotonic time the data was requested from the device
+        self.data_requested_at = 0.0
+        # Delay of scheduled polls behind their due time, see the scheduler
+        self.poll_drift = WindowedHistogram()
+        self.info: dict[str, Any] | None = None
+        self.stale = False
+        self._cache_store: ThrottledStore[dict[str, Any]] = ThrottledStore(
+            hass, STORAGE_VERSION, CACHE_STORAGE_KEY.format(entry_id=entry.entry_id)
+        )
+        self.energy = EnergyAccumulator()
+        # Only kept while a statistics sensor uses it
+        self.samples: SampleRingBuffer | None = None
+        self.cycles: CycleDetector | None = None
+        self.energy_restored = False
+        self._energy_store: ThrottledStore[dict[str, Any]] = ThrottledStore(
+            hass, STORAGE_VERSION, ENERGY_STORAGE_KEY.format(entry_id=entry.entry_id)
+        )
+
+    @property
+    def poll_interval(self) -> timedelta:
+        """Return the interval the device is polled at."""
+        return self._poll_interval
+
+    @poll_interval.setter
+    def poll_interval(self, interval: timedelta) -> None:
+        """Set the poll interval, also in the poll worker."""
+        self._poll_interval = interval
+        if self.worker is not None:
+            self.worker.async_set_interval(
+                interval.total_seconds(), self._request_timeout
+            )
+
+    @callback
+    def async_use_worker(self, workers: MyStromPollWorkers) -> CALLBACK_TYPE:
+        """Let a poll worker poll the device, return a callback to stop."""
+        self.worker = workers.async_subscribe(
+            self.api.host,
+            self.poll_interval.total_seconds(),
+            self._request_timeout,
+            self._async_handle_worker_update,
+        )
+        return self.worker.async_remove
+
+    @callback
+    def _async_handle_worker_update(
+        self, requested_at: float, data: MyStromReport | None, error: str | None
+    ) -> None:
+        """Process a report or an error sent by the poll worker."""
+        if data is None:
+            self.energy.mark_gap()
+            if self.last_update_success:
+                self.async_set_update_error(
+                    UpdateFailed(f"Error communicating with API: {error}")
+                )
+            return
+        if requested_at < self.data_requested_at:
+            # Polled before the state already known, e.g. a pushed relay
+            return
+
+        previous = self.data
+        stale = self.stale
+        self._process_report(requested_at, data)
+        now = time.monotonic()
+        if (
+            self.last_update_success
+            and not stale
+            and previous is not None
+            and _published_state(previous) == _published_state(data)
+            and now - self._published_at < WORKER_HEARTBEAT
+        ):
+            # Processed above, but not worth waking the entities for
+            self.data = data
+            return
+        self._published_at = now
+        self.async_set_updated_data(data)
+
+    async def async_load_cache(self) -> bool:
+        """Publish the cached data, return False if there is none."""
+        cached = await self._cache_store.async_load()
+        if cached is None or cached.get("report") is None:
+            return False
+        try:
+            report = MyStromReport.from_dict(cached["report"])
+        except MyStromReportError:
+            return False
+        self.info = cached.get("info")
+        self.stale = True
+        self.async_set_updated_data(report)
+        return True
+
+    async def async_update_info(self) -> dict[str, Any]:
+        """Fetch the device information and cache it."""
+        self.info = await self.api.get_info()
+        self._cache_store.async_delay_save(self._cache_data, CACHE_SAVE_DELAY)
+        return self.info
+
+    @callback
+    def _cache_data(self) -> dict[str, Any]:
+        """Return the device data to cache."""
+        return {
+            "report": self.data.as_dict() if self.data is not None else None,
+            "info": self.info,
+        }
+
+    async def async_load_energy(self) -> None:
+        """Load the persisted energy total."""
+        if (stored := await self._energy_store.async_load()) is not None:
+            self.energy.restore(stored)
+            self.energy_restored = True
+
+    @callback
+    def async_restore_energy(self, total: float) -> None:
+        """Seed the energy total, e.g. from the last state of the sensor."""
+        self.energy.total = total
+        self.energy_restored = True
+        self._energy_store.async_delay_save(self._energy_data, ENERGY_SAVE_DELAY)
+
+    @callback
+    def _energy_data(self) -> dict[str, Any]:
+        """Return the energy data to persist."""
+        return self.energy.as_dict()
+
+    @callback
+    def async_set_scan_interval(
+        self, scan_interval: int, adaptive_bounds: tuple[int, int] | None
+    ) -> None:
+        """Set the entry's poll interval, following the activity if adaptive.
+
+        With adaptive bounds, the interval drops to the lower bound while the
+        power reading or the relay changes and doubles with every stable
+        reading up to the upper bound. The interval of a profile overrides
+        both, a device that pushes its changes keeps its liveness interval.
+        """
+        if self._liveness_only:
+            return
+        self._scan_interval = timedelta(seconds=scan_interval)
+        self._adaptive_bounds = None
+        if adaptive_bounds is not None:
+            min_interval, max_interval = adaptive_bounds
+            self._adaptive_bounds = (
+                timedelta(seconds=min_interval),
+                timedelta(seconds=max_interval),
+            )
+        if self._profile_interval is None:
+            self.async_set_profile_interval(None)
+
+    @callback
+    def async_add_window(self, field: str, seconds: float) -> RollingWindow:
+        """Return a rolling window, creating the sample history on first use."""
+        if self.samples is None:
+            capacity = math.ceil(seconds / self.poll_interval.total_seconds())
+            self.samples = SampleRingBuffer(
+                max(capacity, SAMPLE_BUFFER_MIN_SIZE), SAMPLE_BUFFER_MAX_SIZE
+            )
+        return self.samples.add_window(field, seconds)
+
+    @callback
+    def async_remove_window(self, window: RollingWindow) -> None:
+        """Release a window, dropping the sample history when unused."""
+        if self.samples is None:
+            return
+        self.samples.remove_window(window)
+        if not self.samples.has_windows:
+            self.samples = None
+
+    @callback
+    def async_enable_cycles(self, detector: CycleDetector) -> None:
+        """Run the cycle detector on every sample."""
+        self.cycles = detector
+
+    @callback
+    def async_set_liveness_interval(self, interval: int) -> None:
+        """Poll only to check the device is alive, e.g. when it pushes changes."""
+        self._liveness_only = True
+        self._adaptive_bounds = None
+        self._scan_interval = timedelta(seconds=interval)
+        self.poll_interval = self._profile_interval or self._scan_interval
+
+    @callback
+    def async_set_profile_interval(self, interval: int | None) -> None:
+        """Poll at the fixed interval of a profile, None restores the entry's."""
+        if interval is not None:
+            self._profile_interval = self.poll_interval = timedelta(seconds=interval)
+            return
+        self._profile_interval = None
+        if self._adaptive_bounds is not None:
+            self.poll_interval = self._adaptive_bounds[0]
+        else:
+            self.poll_interval = self._scan_interval
+
+    @callback
+    def async_set_request_timeout(self, timeout: float | None) -> None:
+        """Set the request timeout of a profile, None restores the default."""
+        self._request_timeout = timeout
+        if timeout is None:
+            self.api.timeout = self._default_timeout
+        else:
+            self.api.timeout = request_timeout(timeout)
+        if self.worker is not None:
+            self.worker.async_set_interval(self.poll_interval.total_seconds(), timeout)
+
+    @callback
+    def async_set_deadbands(self, deadbands: dict[str, str]) -> None:
+        """Set the deadbands the sensors filter their updates with."""
+        self.deadbands = {
+            option: parse_deadband(deadband) for option, deadband in deadbands.items()
+        }
+
+    @callback
+    def async_note_command(self) -> None:
+        """Poll quickly after a command was sent to the device."""
+        if self._adaptive_bounds is not None and self._profile_interval is None:
+            self.poll_interval = self._adaptive_bounds[0]
+
+    async def _async_update_data(self) -> MyStromReport:
+        """Fetch data from API."""
+        requested_at = time.monotonic()
+        try:
+            if self.worker is not None:
+                data = await self.worker.async_poll()
+            else:
+                data = await self.api.get_state()
+        except Exception as err:
+            self.energy.mark_gap()
+            raise UpdateFailed(f"Error communicating with API: {err}") from err
+
+        self._process_report(requested_at, data)
+        return data
+
+    def _process_report(self, requested_at: float, data: MyStromReport) -> None:
+        """Feed a new report into the cache, energy, samples and cycles."""
+        self.data_requested_at = requested_at
+        self.stale = False
+        self._cache_store.async_delay_save(self._cache_data, CACHE_SAVE_DELAY)
+        # A worker may pass on a report a while after it was polled
+        self.energy.add_report(requested_at, data)
+        if self.samples is not None:
+            self.samples.append(requested_at, data.power, data.temperature)
+        self._energy_store.async_delay_save(self._energy_data, ENERGY_SAVE_DELAY)
+        if self.cycles is not None:
+            self._detect_cycle(requested_at, data.power)
+
+        if self._adaptive_bounds is not None and self._profile_interval is None:
+            self._adapt_poll_interval(data)
+
+    def _detect_cycle(self, now: float, power: float) -> None:
+        """Feed the cycle detector and fire an event on a transition."""
+        cycles = self.cycles
+        if (transition := cycles.add_sample(now, power, self.energy.total)) is None:
+            return
+        started = dt_util.utcnow() - timedelta(seconds=now - cycles.started_at)
+        event_data: dict[str, Any] = {
+            ATTR_ENTRY_ID: self._entry.entry_id,
+            CONF_NAME: self._entry.title,
+            ATTR_STARTED: started.isoformat(),
+        }
+        if transition == CYCLE_START:
+            self.hass.bus.async_fire(EVENT_CYCLE_START, event_data)
+            return
+        event_data[ATTR_DURATION] = round(cycles.duration, 1)
+        event_data[ATTR_ENERGY] = round(cycles.energy, 4)
+        event_data[ATTR_PEAK_POWER] = cycles.peak_power
+        self.hass.bus.async_fire(EVENT_CYCLE_END, event_data)
+
+    def _adapt_poll_interval(self, data: MyStromReport) -> None:
+        """Shorten the poll interval on activity, back off when stable."""
+        min_interval, max_interval = self._adaptive_bounds
+        previous = self.data
+
+        if previous is None or previous.relay != data.relay:
+            active = True
+        else:
+            delta = abs(data.power - previous.power)
+            reference = max(abs(data.power), abs(previous.power))
+            active = delta > max(
+                ADAPTIVE_POWER_THRESHOLD, ADAPTIVE_POWER_THRESHOLD_RELATIVE * reference
+            )
+
+        if active:
+            self.poll_interval = min_interval
+        else:
+            self.poll_interval = min(self.poll_interval * 2, max_interval)
+
+    @callback
+    def async_push_relay(self, relay: bool) -> None:
+        """Apply a relay change reported by the device itself.
+
+        The relay state is published right away. A debounced refresh follows
+        to pick up the power reading that goes with the new state.
+        """
+        self.data_requested_at = time.monotonic()
+        self.api.invalidate_state()
+        if self.data is not None:
+            self.async_set_updated_data(dataclasses.replace(self.data, relay=relay))
+        self.hass.async_create_task(self.async_request_refresh())
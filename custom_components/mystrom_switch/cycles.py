@@ -0,0 +1,89 @@
+"""Appliance cycle detection for the myStrom Switch integration."""
+from __future__ import annotations
+
+CYCLE_START = "start"
+CYCLE_END = "end"
+
+_IDLE = 0
+_STARTING = 1
+_RUNNING = 2
+_ENDING = 3
+
+
+class CycleDetector:
+    """Detect the operating cycles of an appliance from its power draw.
+
+    A cycle starts once the power stayed at or above start_power for
+    start_hold seconds and ends once it stayed at or below end_power for
+    end_hold seconds. end_power is lower than start_power, so a reading
+    between the two neither starts nor ends a cycle. The cycle is dated
+    back to the first sample that crossed the threshold, and its energy is
+    the increase of the energy total in between.
+
+    The detector is fed one sample at a time and keeps no history.
+    """
+
+    def __init__(
+        self,
+        start_power: float,
+        end_power: float,
+        start_hold: float,
+        end_hold: float,
+    ) -> None:
+        """Initialize the detector."""
+        self.start_power = start_power
+        self.end_power = end_power
+        self.start_hold = start_hold
+        self.end_hold = end_hold
+        self.started_at = 0.0
+        self.ended_at = 0.0
+        self.energy = 0.0
+        self.peak_power = 0.0
+        self._state = _IDLE
+        self._start_energy = 0.0
+        self._end_energy = 0.0
+
+    @property
+    def duration(self) -> float:
+        """Return the duration of the last completed cycle in seconds."""
+        return self.ended_at - self.started_at
+
+    def add_sample(self, timestamp: float, power: float, energy: float) -> str | None:
+        """Add a sample, return CYCLE_START or CYCLE_END on a transition.
+
+        timestamp is monotonic time in seconds, power in W and energy the
+        running energy total in kWh.
+        """
+        state = self._state
+        if state == _IDLE:
+            if power < self.start_power:
+                return None
+            self._state = state = _STARTING
+            self.started_at = timestamp
+            self.peak_power = power
+            self._start_energy = energy
+        elif state == _STARTING and power < self.start_power:
+            self._state = _IDLE
+            return None
+
+        if power > self.peak_power:
+            self.peak_power = power
+
+        if state == _STARTING:
+            if timestamp - self.started_at < self.start_hold:
+                return None
+            self._state = _RUNNING
+            return CYCLE_START
+
+        if power > self.end_power:
+            self._state = _RUNNING
+            return None
+        if state == _RUNNING:
+            self._state = state = _ENDING
+            self.ended_at = timestamp
+            self._end_energy = energy
+        if timestamp - self.ended_at < self.end_hold:
+            return None
+        self._state = _IDLE
+        self.energy = self._end_energy - self._start_energy
+        return CYCLE_END
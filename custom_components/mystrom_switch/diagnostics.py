@@ -0,0 +1,47 @@
+"""Diagnostics support for the myStrom Switch integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_PUSH_TOKEN, DATA_TRANSPORT, DATA_WORKERS, DOMAIN
+
+TO_REDACT = {CONF_PUSH_TOKEN, "mac", "ssid", "unique_id"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = data["coordinator"]
+    api = data["api"]
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "info": async_redact_data(coordinator.info or {}, TO_REDACT),
+        "data": coordinator.data.as_dict() if coordinator.data else None,
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "stale": coordinator.stale,
+            "poll_interval": coordinator.poll_interval.total_seconds(),
+            "poll_drift": coordinator.poll_drift.as_dict(),
+            "energy": coordinator.energy.as_dict(),
+        },
+        "api": {
+            "circuit_breaker": api.breaker.as_dict(),
+            "commands": api.commands.as_dict(),
+            "requests": {
+                endpoint: stats.as_dict() for endpoint, stats in api.stats.items()
+            },
+        },
+        "transport": hass.data[DOMAIN][DATA_TRANSPORT].as_dict(),
+        "workers": (
+            hass.data[DOMAIN][DATA_WORKERS].as_dict()
+            if coordinator.worker is not None
+            else None
+        ),
+    }
@@ -0,0 +1,191 @@
+"""Active discovery of myStrom devices on IP ranges."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import ipaddress
+import logging
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import aiohttp
+from yarl import URL
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_PORT = 80
+SCAN_CONCURRENCY = 256
+SCAN_MAX_HOSTS = 4096
+# Devices on the local network accept a connection within a few ms; closed
+# ports are refused immediately and silent addresses give up after this
+SCAN_CONNECT_TIMEOUT = 0.5
+SCAN_INFO_TIMEOUT = aiohttp.ClientTimeout(total=2)
+
+INFO_CACHE_TTL = 3600
+INFO_CACHE_NEGATIVE_TTL = 60
+
+
+class InvalidNetworks(ValueError):
+    """Error to indicate the ranges could not be parsed or are too large."""
+
+
+def parse_networks(value: str | Iterable[str]) -> list[str]:
+    """Return the host addresses of comma separated CIDR ranges.
+
+    Raises:
+        InvalidNetworks: A range is malformed, or the ranges together hold
+            more than SCAN_MAX_HOSTS addresses
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    networks = []
+    try:
+        for part in value:
+            if part.strip():
+                networks.append(ipaddress.ip_network(part.strip(), strict=False))
+    except ValueError as err:
+        raise InvalidNetworks(str(err)) from err
+    if not networks:
+        raise InvalidNetworks("no network given")
+    if sum(network.num_addresses for network in networks) > SCAN_MAX_HOSTS:
+        raise InvalidNetworks(f"more than {SCAN_MAX_HOSTS} addresses")
+
+    hosts: dict[str, None] = {}
+    for network in networks:
+        # hosts() leaves out the network and broadcast address
+        addresses = network.hosts() if network.num_addresses > 2 else network
+        hosts.update(dict.fromkeys(str(address) for address in addresses))
+    return list(hosts)
+
+
+async def async_scan(
+    session: aiohttp.ClientSession,
+    hosts: Iterable[str],
+    concurrency: int = SCAN_CONCURRENCY,
+    connect_timeout: float = SCAN_CONNECT_TIMEOUT,
+) -> dict[str, dict[str, Any]]:
+    """Probe hosts for myStrom devices.
+
+    A fixed number of workers share the host list. Each host first gets a
+    bare TCP connect to port 80, so closed ports and unused addresses are
+    dropped without an HTTP request. Hosts that accept are asked for
+    /info; an answer with a MAC address counts as a device.
+
+    Returns:
+        Mapping of host to the /info response of every device found
+    """
+    pending = iter(hosts)
+    found: dict[str, dict[str, Any]] = {}
+
+    async def worker() -> None:
+        for host in pending:
+            if (info := await _async_probe(session, host, connect_timeout)) is not None:
+                found[host] = info
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    _LOGGER.debug("Scan found %d myStrom devices", len(found))
+    return found
+
+
+async def _async_probe(
+    session: aiohttp.ClientSession, host: str, connect_timeout: float
+) -> dict[str, Any] | None:
+    """Return the /info response of host if it is a myStrom device."""
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, SCAN_PORT), connect_timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return None
+    writer.close()
+    with contextlib.suppress(OSError):
+        await writer.wait_closed()
+    return await async_fetch_info(session, host)
+
+
+async def async_fetch_info(
+    session: aiohttp.ClientSession, host: str
+) -> dict[str, Any] | None:
+    """Return the /info response of host, or None if it is no myStrom device."""
+    try:
+        async with session.get(
+            URL.build(scheme="http", host=host, path="/info"),
+            timeout=SCAN_INFO_TIMEOUT,
+        ) as response:
+            if response.status != 200:
+                return None
+            info = await response.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return None
+    if not isinstance(info, dict) or not info.get("mac"):
+        return None
+    return info
+
+
+class InfoCache:
+    """Cache /info responses by host.
+
+    Devices are announced again and again by mDNS and DHCP, often many at
+    once after a network outage. Answers are kept for ttl seconds, hosts
+    that did not answer as a myStrom device for negative_ttl seconds, and
+    concurrent lookups of one host share a single request.
+
+    Entries expire at a wall clock time, so they can be persisted: on_change
+    is called whenever an entry was stored, as_dict returns what to save and
+    restore takes it back. Expired entries are dropped by as_dict.
+    """
+
+    def __init__(
+        self,
+        ttl: float = INFO_CACHE_TTL,
+        negative_ttl: float = INFO_CACHE_NEGATIVE_TTL,
+        on_change: Callable[[], None] | None = None,
+    ) -> None:
+        """Initialize the cache."""
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._on_change = on_change
+        self._entries: dict[str, tuple[float, dict[str, Any] | None]] = {}
+        self._requests: dict[str, asyncio.Future] = {}
+
+    async def async_get(
+        self, session: aiohttp.ClientSession, host: str
+    ) -> dict[str, Any] | None:
+        """Return the cached /info of host, fetching it if needed."""
+        entry = self._entries.get(host)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        if (request := self._requests.get(host)) is None:
+            request = asyncio.ensure_future(async_fetch_info(session, host))
+            self._requests[host] = request
+            request.add_done_callback(lambda task: self._async_fetched(host, task))
+        return await asyncio.shield(request)
+
+    def set(self, host: str, info: dict[str, Any] | None) -> None:
+        """Store the /info of host, None if it is no myStrom device."""
+        ttl = self._ttl if info is not None else self._negative_ttl
+        self._entries[host] = (time.time() + ttl, info)
+        if self._on_change is not None:
+            self._on_change()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the entries that have not expired, dropping the others."""
+        now = time.time()
+        self._entries = {
+            host: entry for host, entry in self._entries.items() if entry[0] > now
+        }
+        return {"entries": self._entries}
+
+    def restore(self, data: dict[str, Any]) -> None:
+        """Add the entries returned by as_dict, keeping newer ones."""
+        now = time.time()
+        for host, (expires, info) in data["entries"].items():
+            if expires > now:
+                self._entries.setdefault(host, (expires, info))
+
+    def _async_fetched(self, host: str, task: asyncio.Future) -> None:
+        """Store the result of a finished request."""
+        del self._requests[host]
+        if not task.cancelled() and task.exception() is None:
+            self.set(host, task.result())
@@ -0,0 +1,182 @@
+"""Long-term statistics import for the myStrom Switch integration."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_NAME, UnitOfEnergy, UnitOfPower
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    ENERGY_MAX_GAP,
+    STATISTICS_BUCKET,
+    STATISTICS_SAVE_DELAY,
+    STATISTICS_STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from .store import ThrottledStore
+
+if TYPE_CHECKING:
+    from .coordinator import MyStromDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Bucket layout: [start timestamp, samples, power sum, power min, power max, energy,
+# seconds held, power integral in Ws]
+_START, _COUNT, _SUM, _MIN, _MAX, _ENERGY, _SECONDS, _INTEGRAL = range(8)
+
+
+class EnergyStatisticsImporter:
+    """Aggregate the samples of a device into hourly long-term statistics.
+
+    Samples are collected in 5 minute buckets. When an hour is complete, its
+    buckets are combined and imported as external statistics (power mean,
+    min and max, and the energy total as state and sum), which keeps the
+    Energy dashboard working without recording every sensor state. Home
+    Assistant only accepts hourly imports, the 5 minute buckets are the
+    granularity at which the hour in progress is persisted. An hour that
+    was in progress during a restart is completed and imported on start.
+
+    The power mean is weighted by time: every sample holds until the next
+    one, so an irregular poll rate (adaptive polling, commands, retries)
+    does not skew it. A failed poll or a gap longer than ENERGY_MAX_GAP
+    seconds ends the hold, like the energy integration.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        coordinator: MyStromDataUpdateCoordinator,
+    ) -> None:
+        """Initialize the importer."""
+        self._hass = hass
+        self._coordinator = coordinator
+        self._store: ThrottledStore[dict[str, Any]] = ThrottledStore(
+            hass,
+            STORAGE_VERSION,
+            STATISTICS_STORAGE_KEY.format(entry_id=entry.entry_id),
+        )
+        self._buckets: list[list[float]] = []
+        self._last: tuple[float, float] | None = None
+        name = entry.data.get(CONF_NAME, entry.title)
+        object_id = entry.entry_id.lower()
+        self._power_metadata = StatisticMetaData(
+            has_mean=True,
+            has_sum=False,
+            name=f"{name} Power",
+            source=DOMAIN,
+            statistic_id=f"{DOMAIN}:power_{object_id}",
+            unit_of_measurement=UnitOfPower.WATT,
+        )
+        self._energy_metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{name} Energy",
+            source=DOMAIN,
+            statistic_id=f"{DOMAIN}:energy_{object_id}",
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        )
+
+    async def async_start(self) -> CALLBACK_TYPE:
+        """Restore the hour in progress and start collecting samples."""
+        if (stored := await self._store.async_load()) is not None:
+            self._buckets = stored["buckets"]
+        self._async_complete_hour(dt_util.utcnow())
+        return self._coordinator.async_add_listener(self._async_handle_update)
+
+    @callback
+    def _async_handle_update(self) -> None:
+        """Add the latest sample of the coordinator."""
+        if not self._coordinator.last_update_success or not self._coordinator.data:
+            self._last = None
+            return
+
+        now = dt_util.utcnow()
+        timestamp = now.timestamp()
+        if self._last is not None:
+            # The previous sample held until now, split the hold at the bucket
+            # boundaries so that every bucket (and hour) gets its own share
+            held_from, last_power = self._last
+            if 0 < timestamp - held_from <= ENERGY_MAX_GAP:
+                while held_from < timestamp:
+                    bucket = self._bucket(held_from, last_power)
+                    held_until = min(bucket[_START] + STATISTICS_BUCKET, timestamp)
+                    bucket[_SECONDS] += held_until - held_from
+                    bucket[_INTEGRAL] += last_power * (held_until - held_from)
+                    held_from = held_until
+        self._async_complete_hour(now)
+
+        power = self._coordinator.data.power
+        self._last = (timestamp, power)
+        bucket = self._bucket(timestamp, power)
+        bucket[_COUNT] += 1
+        bucket[_SUM] += power
+        bucket[_MIN] = min(bucket[_MIN], power)
+        bucket[_MAX] = max(bucket[_MAX], power)
+        bucket[_ENERGY] = self._coordinator.energy.total
+
+        self._store.async_delay_save(self._data_to_save, STATISTICS_SAVE_DELAY)
+
+    def _bucket(self, timestamp: float, power: float) -> list[float]:
+        """Return the bucket of timestamp, starting it if needed."""
+        start = timestamp // STATISTICS_BUCKET * STATISTICS_BUCKET
+        if not self._buckets or self._buckets[-1][_START] != start:
+            # A bucket without samples of its own keeps the previous total
+            energy = self._buckets[-1][_ENERGY] if self._buckets else 0.0
+            self._buckets.append([start, 0, 0.0, power, power, energy, 0.0, 0.0])
+        return self._buckets[-1]
+
+    @callback
+    def _async_complete_hour(self, now: datetime) -> None:
+        """Import the collected hour once now has moved past it."""
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        if not self._buckets or self._buckets[0][_START] >= hour.timestamp():
+            return
+
+        # The hold of the last sample may already have started the new hour
+        buckets = [b for b in self._buckets if b[_START] < hour.timestamp()]
+        self._buckets = self._buckets[len(buckets) :]
+        self._store.async_delay_save(self._data_to_save, STATISTICS_SAVE_DELAY)
+
+        if "recorder" not in self._hass.config.components:
+            _LOGGER.debug("Recorder not loaded, dropping statistics of %s", hour)
+            return
+
+        start = dt_util.utc_from_timestamp(buckets[0][_START]).replace(
+            minute=0, second=0, microsecond=0
+        )
+        if seconds := sum(bucket[_SECONDS] for bucket in buckets):
+            mean = sum(bucket[_INTEGRAL] for bucket in buckets) / seconds
+        else:
+            count = sum(bucket[_COUNT] for bucket in buckets)
+            mean = sum(bucket[_SUM] for bucket in buckets) / count
+        energy = buckets[-1][_ENERGY]
+        async_add_external_statistics(
+            self._hass,
+            self._power_metadata,
+            [
+                StatisticData(
+                    start=start,
+                    mean=mean,
+                    min=min(bucket[_MIN] for bucket in buckets),
+                    max=max(bucket[_MAX] for bucket in buckets),
+                )
+            ],
+        )
+        async_add_external_statistics(
+            self._hass,
+            self._energy_metadata,
+            [StatisticData(start=start, state=energy, sum=energy)],
+        )
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the hour in progress to persist."""
+        return {"buckets": self._buckets}
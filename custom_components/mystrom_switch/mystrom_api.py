@@ -1,93 +1,707 @@
-"""API client for myStrom devices."""
+"""API client for myStrom devices.
+
+The module does not depend on Home Assistant and doubles as a command line
+poller for many devices:
+
+    python mystrom_api.py 192.168.1.10 192.168.1.11 --interval 5 --fixed-rate
+    python mystrom_api.py --hosts-file plugs.txt --format csv --output plugs.csv
+
+With --worker it polls on behalf of another process instead, see PollWorker.
+"""
 from __future__ import annotations
 
+import argparse
 import asyncio
+import csv
+import io
+import json
 import logging
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Any
 
 import aiohttp
+from yarl import URL
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # Running standalone without orjson
+    json_loads = json.loads
 
 _LOGGER = logging.getLogger(__name__)
 
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# The embedded HTTP server of the devices handles very few connections at
+# once, so requests to one device share a small pool of kept-alive sockets.
+TRANSPORT_LIMIT_PER_HOST = 2
+TRANSPORT_KEEPALIVE_TIMEOUT = 20
+TRANSPORT_CONNECT_TIMEOUT = 3
+TRANSPORT_READ_TIMEOUT = 7
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_BASE_BACKOFF = 10
+BREAKER_MAX_BACKOFF = 600
+BREAKER_PROBE_TIMEOUT = aiohttp.ClientTimeout(total=3, connect=1)
+
+# Upper bounds of the latency histogram buckets in s, slower requests land
+# in an extra overflow bucket
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds after which the recent part of a windowed histogram is rotated
+HISTOGRAM_WINDOW = 600
+
+# Seconds between the batches of a poll worker
+WORKER_BATCH_INTERVAL = 1.0
+
+ENDPOINT_REPORT = "report"
+ENDPOINT_RELAY = "relay"
+ENDPOINT_TOGGLE = "toggle"
+ENDPOINT_INFO = "info"
+ENDPOINT_DEVICE = "device"
+
+COMMAND_ON = "on"
+COMMAND_OFF = "off"
+COMMAND_TOGGLE = "toggle"
+
+# Reads within this many seconds of a completed /report reuse its result
+STATE_TTL = 0.5
+
+
+class MyStromUnavailableError(Exception):
+    """Error to indicate the device is skipped by its circuit breaker."""
+
+
+class MyStromReportError(ValueError):
+    """Error to indicate the device sent a malformed /report."""
+
+
+def _number(data: dict[str, Any], key: str, required: bool = False) -> float | None:
+    """Return a numeric field of a /report, None if it is missing."""
+    value = data.get(key)
+    if value is None:
+        if required:
+            raise MyStromReportError(f"/report without {key}: {data!r}")
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise MyStromReportError(f"Invalid {key} in /report: {value!r}")
+    return float(value)
+
+
+@dataclass(frozen=True, slots=True)
+class MyStromReport:
+    """A validated /report of a myStrom switch.
+
+    power and relay are always present. The other fields are None when the
+    firmware does not report them.
+    """
+
+    power: float
+    relay: bool
+    temperature: float | None = None
+    # Average power over the device's last measurement period in W
+    ws: float | None = None
+    # Energy counted by the device since boot in Ws
+    energy_since_boot: float | None = None
+    # Uptime in s
+    time_since_boot: float | None = None
+    # Changes with every reboot
+    boot_id: str | None = None
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> MyStromReport:
+        """Decode and validate a /report response body."""
+        try:
+            data = json_loads(body)
+        except ValueError as err:
+            raise MyStromReportError(f"/report is not valid JSON: {err}") from err
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_dict(cls, data: Any) -> MyStromReport:
+        """Validate a decoded /report, or a dict returned by as_dict."""
+        if not isinstance(data, dict):
+            raise MyStromReportError(f"/report is not an object: {data!r}")
+        relay = data.get("relay")
+        if not isinstance(relay, bool):
+            raise MyStromReportError(f"Invalid relay in /report: {relay!r}")
+        boot_id = data.get("boot_id")
+        if boot_id is not None and not isinstance(boot_id, str):
+            raise MyStromReportError(f"Invalid boot_id in /report: {boot_id!r}")
+        return cls(
+            _number(data, "power", required=True),
+            relay,
+            _number(data, "temperature"),
+            _number(data, "Ws"),
+            _number(data, "energy_since_boot"),
+            _number(data, "time_since_boot"),
+            boot_id,
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the report with the keys used by the firmware."""
+        return {
+            "power": self.power,
+            "Ws": self.ws,
+            "relay": self.relay,
+            "temperature": self.temperature,
+            "energy_since_boot": self.energy_since_boot,
+            "time_since_boot": self.time_since_boot,
+            "boot_id": self.boot_id,
+        }
+
+
+class Histogram:
+    """Count durations in fixed buckets."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize the histogram."""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        """Count a duration in s."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, share: float) -> float | None:
+        """Return the upper bound of the bucket holding the given share."""
+        if not self.count:
+            return None
+        rank = share * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram for diagnostics."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+            "buckets": dict(
+                zip([*map(str, self.bounds), "inf"], self.counts, strict=True)
+            ),
+        }
+
+
+class WindowedHistogram(Histogram):
+    """Count durations in fixed buckets, since startup and recently.
+
+    Besides the cumulative counts, the durations are counted in a current
+    and a previous window of HISTOGRAM_WINDOW seconds, which are rotated
+    as time passes. recent_percentile covers both windows, so it follows
+    the last 10 to 20 minutes instead of averaging over the whole uptime.
+    """
+
+    __slots__ = ("_current", "_previous", "_rotated")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize the histogram."""
+        super().__init__(bounds)
+        self._current = Histogram(bounds)
+        self._previous = Histogram(bounds)
+        self._rotated = time.monotonic()
+
+    def _rotate(self) -> None:
+        """Start a new window if the current one is over."""
+        now = time.monotonic()
+        if (elapsed := now - self._rotated) < HISTOGRAM_WINDOW:
+            return
+        self._previous = (
+            self._current if elapsed < 2 * HISTOGRAM_WINDOW else Histogram(self.bounds)
+        )
+        self._current = Histogram(self.bounds)
+        self._rotated = now
+
+    def record(self, value: float) -> None:
+        """Count a duration in s."""
+        super().record(value)
+        self._rotate()
+        self._current.record(value)
+
+    def recent_percentile(self, share: float) -> float | None:
+        """Return the percentile over the current and the previous window."""
+        self._rotate()
+        recent = Histogram(self.bounds)
+        for histogram in (self._previous, self._current):
+            recent.counts = [a + b for a, b in zip(recent.counts, histogram.counts)]
+            recent.count += histogram.count
+            recent.max = max(recent.max, histogram.max)
+        return recent.percentile(share)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram for diagnostics."""
+        return {**super().as_dict(), "recent_p95": self.recent_percentile(0.95)}
+
+
+class RequestStats:
+    """Latency, failures and received bytes of the requests to one endpoint."""
+
+    __slots__ = ("latency", "errors", "timeouts", "bytes_received")
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self.latency = WindowedHistogram()
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes_received = 0
+
+    def record(self, latency: float, size: int) -> None:
+        """Record an answered request."""
+        self.latency.record(latency)
+        self.bytes_received += size
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics for diagnostics."""
+        return {
+            "latency": self.latency.as_dict(),
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "bytes_received": self.bytes_received,
+        }
+
+
+class CircuitBreaker:
+    """Track the reachability of a device.
+
+    After failure_threshold consecutive failures the breaker opens and
+    requests fail fast without touching the network. Once the backoff has
+    passed, a single probe request is let through (half open). A successful
+    probe closes the breaker, a failed one doubles the backoff up to
+    max_backoff.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        base_backoff: float = BREAKER_BASE_BACKOFF,
+        max_backoff: float = BREAKER_MAX_BACKOFF,
+    ) -> None:
+        """Initialize the circuit breaker."""
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.next_probe = 0.0
+        self._failure_threshold = failure_threshold
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        self._backoff = base_backoff
+
+    def rejects(self, now: float) -> bool:
+        """Return True if a request at monotonic time now should fail fast."""
+        return self.state != BREAKER_CLOSED and now < self.next_probe
+
+    def allow_request(self, now: float) -> bool:
+        """Return True if a request may be sent, entering half open if due."""
+        if self.rejects(now):
+            return False
+        if self.state == BREAKER_OPEN:
+            self.state = BREAKER_HALF_OPEN
+        return True
+
+    def record_success(self) -> bool:
+        """Record a successful request, return True if the breaker closed."""
+        recovered = self.state != BREAKER_CLOSED
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self._backoff = self._base_backoff
+        return recovered
+
+    def record_failure(self, now: float) -> bool:
+        """Record a failed request, return True if the breaker just opened."""
+        self.failures += 1
+        if self.state == BREAKER_HALF_OPEN:
+            self._backoff = min(self._backoff * 2, self._max_backoff)
+        elif self.failures < self._failure_threshold:
+            return False
+        opened = self.state == BREAKER_CLOSED
+        self.state = BREAKER_OPEN
+        self.next_probe = now + self._backoff
+        return opened
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the breaker state for diagnostics."""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "backoff": self._backoff,
+        }
+
+
+class CommandQueue:
+    """Serialize the relay commands sent to one device.
+
+    Only one command is on the wire at a time. Commands submitted while
+    another one is in flight are merged into a single pending command:
+    on and off replace whatever is pending, and a toggle becomes the
+    opposite of the state the queue is heading for. A toggle without a
+    known target is sent as /toggle, and two of those cancel each other
+    out. Every caller gets the result of the request its command ended
+    up in.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[bool]]) -> None:
+        """Initialize the command queue."""
+        self.submitted = 0
+        self.sent = 0
+        self.collapsed = 0
+        self.max_depth = 0
+        self.last_latency: float | None = None
+        self._send = send
+        self._pending: str | None = None
+        self._target: bool | None = None
+        self._waiters: list[asyncio.Future] = []
+        self._worker: asyncio.Task | None = None
+        self._latency_total = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Return the number of callers waiting for a command to be sent."""
+        return len(self._waiters)
+
+    @property
+    def busy(self) -> bool:
+        """Return True while a command is pending or in flight."""
+        return self._worker is not None
+
+    async def submit(self, command: str) -> bool:
+        """Queue a command and wait until the device has answered it."""
+        self.submitted += 1
+        if command == COMMAND_TOGGLE and self._target is not None:
+            command = COMMAND_OFF if self._target else COMMAND_ON
+        if command == COMMAND_TOGGLE:
+            # Two unresolved toggles in a row leave the relay as it is
+            self._pending = None if self._pending == COMMAND_TOGGLE else command
+        else:
+            self._pending = command
+            self._target = command == COMMAND_ON
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.max_depth = max(self.max_depth, len(self._waiters))
+        if self._worker is None:
+            self._worker = asyncio.ensure_future(self._async_run())
+        return await waiter
+
+    async def _async_run(self) -> None:
+        """Send pending commands until the queue is empty."""
+        waiters: list[asyncio.Future] = []
+        try:
+            while self._waiters:
+                command, waiters = self._pending, self._waiters
+                self._pending, self._waiters = None, []
+                self.collapsed += len(waiters) - (command is not None)
+                success = True
+                if command is not None:
+                    start = time.monotonic()
+                    success = await self._send(command)
+                    self.last_latency = time.monotonic() - start
+                    self._latency_total += self.last_latency
+                    self.sent += 1
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(success)
+        finally:
+            for waiter in waiters + self._waiters:
+                if not waiter.done():
+                    waiter.cancel()
+            self._waiters = []
+            self._pending = None
+            self._worker = None
+            self._target = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the queue statistics for diagnostics."""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "collapsed": self.collapsed,
+            "last_latency": self.last_latency,
+            "mean_latency": self._latency_total / self.sent if self.sent else None,
+        }
+
+
+def request_timeout(total: float) -> aiohttp.ClientTimeout:
+    """Return the timeout of a request that may take total seconds."""
+    return aiohttp.ClientTimeout(
+        total=total, connect=min(TRANSPORT_CONNECT_TIMEOUT, total)
+    )
+
+
+class MyStromTransport:
+    """HTTP transport dedicated to myStrom devices.
+
+    Owns a ClientSession whose connector keeps connections to each device
+    alive and limits how many are opened per host. Connect and read
+    timeouts are separate, so an unreachable device fails after the short
+    connect timeout. The transport counts new connections and reused ones.
+    A limit of 0 leaves the total number of connections unbounded.
+    """
+
+    def __init__(
+        self,
+        limit: int = 0,
+        limit_per_host: int = TRANSPORT_LIMIT_PER_HOST,
+        keepalive_timeout: float = TRANSPORT_KEEPALIVE_TIMEOUT,
+        connect_timeout: float = TRANSPORT_CONNECT_TIMEOUT,
+        read_timeout: float = TRANSPORT_READ_TIMEOUT,
+    ) -> None:
+        """Initialize the transport."""
+        self.timeout = aiohttp.ClientTimeout(
+            total=connect_timeout + read_timeout,
+            connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+        self.connections_created = 0
+        self.connections_reused = 0
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Return the session, creating it on first use."""
+        if self._session is None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._limit,
+                    limit_per_host=self._limit_per_host,
+                    keepalive_timeout=self._keepalive_timeout,
+                ),
+                timeout=self.timeout,
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the connection counters."""
+        return {
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+        }
+
+    async def close(self) -> None:
+        """Close the session and all its connections."""
+        if self._session is not None:
+            _LOGGER.debug("Closing myStrom transport: %s", self.as_dict())
+            await self._session.close()
+            self._session = None
+
+    async def _on_connection_created(self, session, context, params) -> None:
+        """Count a newly established connection."""
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params) -> None:
+        """Count a request served over a kept-alive connection."""
+        self.connections_reused += 1
+
 
 class MyStromAPI:
     """Class to communicate with myStrom WiFi Switch via REST API."""
 
-    def __init__(self, host: str, session: aiohttp.ClientSession) -> None:
+    def __init__(
+        self,
+        host: str,
+        session: aiohttp.ClientSession,
+        timeout: aiohttp.ClientTimeout = DEFAULT_TIMEOUT,
+        state_ttl: float = STATE_TTL,
+    ) -> None:
         """Initialize the API client."""
         self.host = host
         self.session = session
-        self._base_url = f"http://{host}"
+        self.breaker = CircuitBreaker()
+        self.commands = CommandQueue(self._send_command)
+        self.stats = {
+            endpoint: RequestStats()
+            for endpoint in (
+                ENDPOINT_REPORT,
+                ENDPOINT_RELAY,
+                ENDPOINT_TOGGLE,
+                ENDPOINT_INFO,
+                ENDPOINT_DEVICE,
+            )
+        }
+        self.state_ttl = state_ttl
+        self.timeout = timeout
+        # Single-flight state reads: at most one /report is in flight, tagged
+        # with the command generation it was started in
+        self._generation = 0
+        self._state_request: tuple[int, asyncio.Future] | None = None
+        self._state: MyStromReport | None = None
+        self._state_at = 0.0
+        self._state_generation = -1
+        # The request URLs never change, build them once
+        base_url = URL(f"http://{host}")
+        self._report_url = base_url / "report"
+        self._command_urls = {
+            COMMAND_ON: (base_url / "relay").with_query(state="1"),
+            COMMAND_OFF: (base_url / "relay").with_query(state="0"),
+            COMMAND_TOGGLE: base_url / "toggle",
+        }
+        self._info_url = base_url / "info"
+        self._device_url = base_url / "api" / "v1" / "device"
 
-    async def get_state(self) -> dict[str, Any]:
+    async def get_state(self) -> MyStromReport:
         """Get current state of the device.
 
-        Returns:
-            Dict with keys:
-            - power: Current power consumption in W
-            - relay: Relay state (True/False)
-            - temperature: Device temperature in °C
+        Concurrent callers share one request and its result, and a result
+        younger than state_ttl is returned without asking the device again.
+        A request started before the last command is never reused; it is
+        awaited and followed by a fresh one, so the device never sees more
+        than one /report at a time.
+
+        Raises:
+            MyStromUnavailableError: The circuit breaker is open
+            MyStromReportError: The device answered with a malformed report
         """
+        while True:
+            generation = self._generation
+            if (
+                self._state is not None
+                and self._state_generation == generation
+                and time.monotonic() - self._state_at < self.state_ttl
+            ):
+                return self._state
+            if self._state_request is None:
+                task = asyncio.ensure_future(self._fetch_state(generation))
+                task.add_done_callback(self._state_request_done)
+                self._state_request = (generation, task)
+            request_generation, task = self._state_request
+            if request_generation == generation:
+                # Shielded so a cancelled caller does not abort the others
+                return await asyncio.shield(task)
+            await asyncio.wait([task])
+
+    def _state_request_done(self, task: asyncio.Future) -> None:
+        """Forget a finished state request."""
+        if self._state_request is not None and self._state_request[1] is task:
+            self._state_request = None
+        # Mark the error as retrieved when every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate_state(self) -> None:
+        """Make the next state read ask the device again."""
+        self._generation += 1
+
+    async def _fetch_state(self, generation: int) -> MyStromReport:
+        """Request /report from the device."""
+        start = time.monotonic()
+        if not self.breaker.allow_request(start):
+            raise MyStromUnavailableError(
+                f"{self.host} is unreachable, next probe in "
+                f"{self.breaker.next_probe - start:.0f}s"
+            )
+        # Probe an unreachable device with a short connect timeout
+        probing = self.breaker.state == BREAKER_HALF_OPEN
+        timeout = BREAKER_PROBE_TIMEOUT if probing else self.timeout
+        stats = self.stats[ENDPOINT_REPORT]
+
         try:
             async with self.session.get(
-                f"{self._base_url}/report",
-                timeout=aiohttp.ClientTimeout(total=10)
+                self._report_url, timeout=timeout
             ) as response:
                 response.raise_for_status()
-                data = await response.json()
-
-                return {
-                    "power": data.get("power", 0.0),
-                    "relay": data.get("relay", False),
-                    "temperature": data.get("temperature", 0.0),
-                }
+                body = await response.read()
         except aiohttp.ClientError as err:
-            _LOGGER.error("Error fetching myStrom state: %s", err)
+            stats.errors += 1
+            self._record_failure(probing, "Error fetching myStrom state: %s", err)
             raise
-        except asyncio.TimeoutError as err:
-            _LOGGER.error("Timeout fetching myStrom state")
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            self._record_failure(probing, "Timeout fetching myStrom state")
             raise
+        stats.record(time.monotonic() - start, len(body))
+
+        if self.breaker.record_success():
+            _LOGGER.info("myStrom %s is reachable again", self.host)
+
+        try:
+            state = MyStromReport.from_bytes(body)
+        except MyStromReportError:
+            stats.errors += 1
+            raise
+        self._state = state
+        self._state_at = time.monotonic()
+        self._state_generation = generation
+        return state
+
+    def _record_failure(self, probing: bool, msg: str, *args: Any) -> None:
+        """Record a failed state request and log it unless backing off."""
+        if self.breaker.record_failure(time.monotonic()):
+            _LOGGER.warning(
+                "myStrom %s did not answer %d times, backing off",
+                self.host,
+                self.breaker.failures,
+            )
+        elif not probing:
+            _LOGGER.error(msg, *args)
 
     async def turn_on(self) -> bool:
         """Turn on the switch."""
-        try:
-            async with self.session.get(
-                f"{self._base_url}/relay",
-                params={"state": "1"},
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                response.raise_for_status()
-                return True
-        except aiohttp.ClientError as err:
-            _LOGGER.error("Error turning on myStrom switch: %s", err)
-            return False
+        return await self.commands.submit(COMMAND_ON)
 
     async def turn_off(self) -> bool:
         """Turn off the switch."""
-        try:
-            async with self.session.get(
-                f"{self._base_url}/relay",
-                params={"state": "0"},
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                response.raise_for_status()
-                return True
-        except aiohttp.ClientError as err:
-            _LOGGER.error("Error turning off myStrom switch: %s", err)
-            return False
+        return await self.commands.submit(COMMAND_OFF)
 
     async def toggle(self) -> bool:
         """Toggle the switch."""
+        return await self.commands.submit(COMMAND_TOGGLE)
+
+    async def _send_command(self, command: str) -> bool:
+        """Send a relay command, called by the command queue."""
+        start = time.monotonic()
+        if self.breaker.rejects(start):
+            _LOGGER.error("myStrom %s is unreachable, command skipped", self.host)
+            return False
+        stats = self.stats[
+            ENDPOINT_TOGGLE if command == COMMAND_TOGGLE else ENDPOINT_RELAY
+        ]
         try:
             async with self.session.get(
-                f"{self._base_url}/toggle",
-                timeout=aiohttp.ClientTimeout(total=10)
+                self._command_urls[command], timeout=self.timeout
             ) as response:
                 response.raise_for_status()
-                return True
+                body = await response.read()
         except aiohttp.ClientError as err:
-            _LOGGER.error("Error toggling myStrom switch: %s", err)
+            stats.errors += 1
+            _LOGGER.error("Error sending %s to myStrom switch: %s", command, err)
             return False
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            _LOGGER.error("Timeout sending %s to myStrom switch", command)
+            return False
+        finally:
+            self.invalidate_state()
+        stats.record(time.monotonic() - start, len(body))
+        return True
 
     async def get_info(self) -> dict[str, Any]:
         """Get device information.
@@ -95,16 +709,48 @@ class MyStromAPI:
         Returns:
             Dict with device info like MAC address, version, etc.
         """
+        start = time.monotonic()
+        stats = self.stats[ENDPOINT_INFO]
         try:
             async with self.session.get(
-                f"{self._base_url}/info",
-                timeout=aiohttp.ClientTimeout(total=10)
+                self._info_url, timeout=self.timeout
             ) as response:
                 response.raise_for_status()
-                return await response.json()
+                body = await response.read()
         except aiohttp.ClientError as err:
+            stats.errors += 1
             _LOGGER.error("Error fetching myStrom info: %s", err)
             raise
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise
+        stats.record(time.monotonic() - start, len(body))
+        return json_loads(body)
+
+    async def set_action_urls(self, mac: str, actions: dict[str, str]) -> None:
+        """Configure the URLs the device calls when its relay changes.
+
+        Args:
+            mac: MAC address of the device as returned by /info
+            actions: Mapping of action name (e.g. "on", "off") to a myStrom
+                action URL like "get://192.168.1.2:8123/path"
+        """
+        start = time.monotonic()
+        stats = self.stats[ENDPOINT_DEVICE]
+        try:
+            async with self.session.post(
+                self._device_url / mac, data=actions, timeout=self.timeout
+            ) as response:
+                response.raise_for_status()
+                body = await response.read()
+        except aiohttp.ClientError as err:
+            stats.errors += 1
+            _LOGGER.error("Error setting myStrom action URLs: %s", err)
+            raise
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise
+        stats.record(time.monotonic() - start, len(body))
 
     async def test_connection(self) -> bool:
         """Test if the device is reachable."""
@@ -113,3 +759,430 @@ class MyStromAPI:
             return True
         except Exception:
             return False
+
+
+REPORT_FIELDS = (
+    "power",
+    "Ws",
+    "relay",
+    "temperature",
+    "energy_since_boot",
+    "time_since_boot",
+    "boot_id",
+)
+CSV_FIELDS = ("ts", "host", *REPORT_FIELDS, "latency_ms", "error")
+
+
+class ReportWriter:
+    """Write poll results as NDJSON or CSV lines.
+
+    Without a path the lines go to stdout. With a path and max_bytes the
+    file is rotated like a log file: path becomes path.1, path.1 becomes
+    path.2 and so on, keeping backups old files. Every CSV file starts
+    with a header.
+    """
+
+    def __init__(
+        self,
+        output_format: str,
+        path: str | None = None,
+        max_bytes: int = 0,
+        backups: int = 5,
+    ) -> None:
+        """Initialize the writer."""
+        self._csv = output_format == "csv"
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._size = 0
+        self._stream: io.TextIOBase = sys.stdout
+        if path is not None:
+            self._open()
+        elif self._csv:
+            self._write_header()
+
+    def write(self, record: dict[str, Any]) -> None:
+        """Write one record."""
+        if self._csv:
+            line = self._csv_line(record)
+        else:
+            line = json.dumps(record, separators=(",", ":")) + "\n"
+        if self._max_bytes and self._size + len(line) > self._max_bytes:
+            self._rotate()
+        self._write_line(line)
+
+    def close(self) -> None:
+        """Flush and close the output."""
+        self._stream.flush()
+        if self._path is not None:
+            self._stream.close()
+
+    def _write_line(self, line: str) -> None:
+        """Write a line and flush it for consumers reading along."""
+        self._stream.write(line)
+        self._stream.flush()
+        self._size += len(line)
+
+    def _csv_line(self, record: dict[str, Any]) -> str:
+        """Format a record as a CSV line."""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(record.get(field, "") for field in CSV_FIELDS)
+        return buffer.getvalue()
+
+    def _write_header(self) -> None:
+        """Write the CSV header."""
+        self._write_line(self._csv_line(dict(zip(CSV_FIELDS, CSV_FIELDS))))
+
+    def _open(self) -> None:
+        """Open the output file, appending to an existing one."""
+        assert self._path is not None
+        self._stream = open(self._path, "a", encoding="utf-8", newline="")
+        self._size = self._stream.tell()
+        if self._csv and not self._size:
+            self._write_header()
+
+    def _rotate(self) -> None:
+        """Move the current file to the first backup and start a new one."""
+        assert self._path is not None
+        self._stream.close()
+        for index in range(self._backups - 1, 0, -1):
+            if os.path.exists(f"{self._path}.{index}"):
+                os.replace(f"{self._path}.{index}", f"{self._path}.{index + 1}")
+        if self._backups:
+            os.replace(self._path, f"{self._path}.1")
+        else:
+            os.remove(self._path)
+        self._open()
+
+
+async def poll_hosts(
+    hosts: list[str],
+    writer: ReportWriter,
+    interval: float,
+    fixed_rate: bool = False,
+    concurrency: int = 64,
+    count: int = 0,
+) -> None:
+    """Poll every host and write each result.
+
+    Each host is polled by its own loop. By default the next poll of a host
+    starts interval seconds after the previous one finished. In fixed-rate
+    mode the polls are aligned to a common grid of interval seconds; a host
+    that is still busy when its next tick comes skips that tick, so slow
+    devices never delay the others. At most concurrency requests are in
+    flight at a time.
+    """
+    transport = MyStromTransport(limit=concurrency)
+    limit = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def poll(host: str) -> None:
+        api = MyStromAPI(host, transport.session, transport.timeout, state_ttl=0)
+        tick = 0
+        while True:
+            requested = loop.time()
+            record: dict[str, Any] = {"ts": None, "host": host}
+            try:
+                async with limit:
+                    record.update((await api.get_state()).as_dict())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                record["error"] = str(err) or type(err).__name__
+            except (MyStromUnavailableError, MyStromReportError) as err:
+                record["error"] = str(err)
+            record["latency_ms"] = round((loop.time() - requested) * 1000, 1)
+            record["ts"] = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+            writer.write(record)
+
+            tick += 1
+            if fixed_rate:
+                # Skip the ticks that passed while this host was busy
+                tick = max(tick, int((loop.time() - start) / interval) + 1)
+                delay = start + tick * interval - loop.time()
+            else:
+                delay = interval
+            if count and tick >= count:
+                break
+            await asyncio.sleep(delay)
+
+    try:
+        await asyncio.gather(*(poll(host) for host in hosts))
+    finally:
+        await transport.close()
+
+
+class PollWorker:
+    """Poll devices on behalf of another process and send back the results.
+
+    The controlling process writes one JSON command per line to stdin:
+
+        {"op": "add", "host": "192.168.1.10", "interval": 10, "timeout": 3}
+        {"op": "interval", "host": "192.168.1.10", "interval": 60}
+        {"op": "poll", "host": "192.168.1.10"}
+        {"op": "remove", "host": "192.168.1.10"}
+
+    Every host is polled by its own loop, right away when its interval gets
+    shorter. "timeout" is the request timeout in seconds, without it the
+    transport's timeouts apply. Once per batch interval, every result since
+    the last batch goes out as one line, with the monotonic time its poll
+    was started at and whether it answers a "poll" command, along with the
+    request statistics of the hosts in the batch:
+
+        {"results": [[host, time, report, error, polled], ...],
+         "stats": {host: [p95 latency, failed requests, bytes received]}}
+
+    The monotonic clock is shared by the processes of a machine, so the
+    times can be compared with the controlling process's own. The result
+    of a "poll" is sent right away. Sending every result rather than the
+    latest per host keeps the samples of hosts polled faster than the batch
+    interval, at the cost of longer lines. The counters of the statistics
+    start from 0 with every worker.
+    """
+
+    def __init__(
+        self,
+        output: io.TextIOBase,
+        batch_interval: float = WORKER_BATCH_INTERVAL,
+        concurrency: int = 64,
+    ) -> None:
+        """Initialize the worker."""
+        self._output = output
+        self._batch_interval = batch_interval
+        self._transport = MyStromTransport(limit=concurrency)
+        self._limit = asyncio.Semaphore(concurrency)
+        self._apis: dict[str, MyStromAPI] = {}
+        self._intervals: dict[str, float] = {}
+        self._loops: dict[str, asyncio.Task] = {}
+        self._wakeups: dict[str, asyncio.Event] = {}
+        self._polls: set[asyncio.Task] = set()
+        self._results: list[list[Any]] = []
+
+    async def run(self, commands: asyncio.StreamReader) -> None:
+        """Handle commands until the input is closed."""
+        flusher = asyncio.create_task(self._flush_periodically())
+        try:
+            while line := await commands.readline():
+                try:
+                    self.handle(json_loads(line))
+                except (ValueError, KeyError, TypeError) as err:
+                    _LOGGER.warning("Ignoring worker command %r: %s", line, err)
+        finally:
+            flusher.cancel()
+            for task in (*self._loops.values(), *self._polls):
+                task.cancel()
+            await self._transport.close()
+
+    def handle(self, command: dict[str, Any]) -> None:
+        """Handle one command."""
+        op = command["op"]
+        host = command["host"]
+        if op in ("add", "interval"):
+            interval = float(command["interval"])
+            if (timeout := command.get("timeout")) is not None:
+                timeout = request_timeout(float(timeout))
+            if interval < self._intervals.get(host, interval):
+                # Do not wait out the longer interval
+                self._wakeups[host].set()
+            self._intervals[host] = interval
+            if host not in self._loops:
+                self._wakeups[host] = asyncio.Event()
+                self._apis[host] = MyStromAPI(
+                    host, self._transport.session, state_ttl=0
+                )
+                self._loops[host] = asyncio.create_task(self._poll_periodically(host))
+            self._apis[host].timeout = timeout or self._transport.timeout
+        elif op == "poll":
+            if (api := self._apis.get(host)) is not None:
+                task = asyncio.create_task(self._poll_now(api))
+                self._polls.add(task)
+                task.add_done_callback(self._polls.discard)
+        elif op == "remove":
+            if (task := self._loops.pop(host, None)) is None:
+                return
+            task.cancel()
+            for state in (self._apis, self._intervals, self._wakeups):
+                state.pop(host, None)
+        else:
+            raise ValueError(f"unknown command {op}")
+
+    async def _poll_periodically(self, host: str) -> None:
+        """Poll a host until it is removed."""
+        api = self._apis[host]
+        wakeup = self._wakeups[host]
+        while True:
+            self._queue(api, *await self._poll(api), False)
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), self._intervals[host])
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_now(self, api: MyStromAPI) -> None:
+        """Poll a host on request and send the result at once."""
+        # Never join a request that was started before the poll was requested
+        api.invalidate_state()
+        requested_at, result = await self._poll(api)
+        if self._apis.get(api.host) is api:
+            self._queue(api, requested_at, result, True)
+            self.flush()
+
+    async def _poll(self, api: MyStromAPI) -> tuple[float, MyStromReport | Exception]:
+        """Return when a host was polled and its report or error."""
+        async with self._limit:
+            requested_at = time.monotonic()
+            try:
+                return requested_at, await api.get_state()
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                MyStromUnavailableError,
+                MyStromReportError,
+            ) as err:
+                return requested_at, err
+
+    def _queue(
+        self,
+        api: MyStromAPI,
+        requested_at: float,
+        result: MyStromReport | Exception,
+        polled: bool,
+    ) -> None:
+        """Queue a result for the next batch."""
+        if isinstance(result, Exception):
+            error = str(result) or type(result).__name__
+            self._results.append([api.host, requested_at, None, error, polled])
+        else:
+            self._results.append(
+                [api.host, requested_at, result.as_dict(), None, polled]
+            )
+
+    async def _flush_periodically(self) -> None:
+        """Send the queued results once per batch interval."""
+        while True:
+            await asyncio.sleep(self._batch_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """Send the queued results as one line."""
+        if not self._results:
+            return
+        stats = {}
+        for host, *_ in self._results:
+            if host in stats or (api := self._apis.get(host)) is None:
+                continue
+            report = api.stats[ENDPOINT_REPORT]
+            stats[host] = [
+                report.latency.recent_percentile(0.95),
+                report.errors + report.timeouts,
+                report.bytes_received,
+            ]
+        batch = {"results": self._results, "stats": stats}
+        self._results = []
+        self._output.write(json.dumps(batch, separators=(",", ":")) + "\n")
+        self._output.flush()
+
+
+async def serve_worker(batch_interval: float, concurrency: int) -> None:
+    """Run a poll worker on stdin and stdout."""
+    loop = asyncio.get_running_loop()
+    commands = asyncio.StreamReader()
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(commands), sys.stdin
+    )
+    worker = PollWorker(sys.stdout, batch_interval, concurrency=concurrency)
+    await worker.run(commands)
+
+
+def _read_hosts(args: argparse.Namespace) -> list[str]:
+    """Return the hosts from the command line and the hosts file."""
+    hosts = list(args.hosts)
+    if args.hosts_file:
+        with open(args.hosts_file, encoding="utf-8") as hosts_file:
+            for line in hosts_file:
+                if (host := line.split("#", 1)[0].strip()):
+                    hosts.append(host)
+    return list(dict.fromkeys(hosts))
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the command line poller."""
+    parser = argparse.ArgumentParser(
+        description="Poll myStrom switches and stream their reports."
+    )
+    parser.add_argument("hosts", nargs="*", help="device addresses")
+    parser.add_argument("--hosts-file", help="file with one address per line")
+    parser.add_argument(
+        "--interval", type=float, default=10, help="seconds between polls"
+    )
+    parser.add_argument(
+        "--fixed-rate",
+        action="store_true",
+        help="poll on a fixed grid, slow devices skip ticks instead of drifting",
+    )
+    parser.add_argument(
+        "--count", type=int, default=0, help="polling rounds, 0 runs forever"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="maximum requests in flight"
+    )
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--output", help="file to write to instead of stdout")
+    parser.add_argument(
+        "--max-bytes", type=int, default=0, help="rotate the output file at this size"
+    )
+    parser.add_argument(
+        "--backups", type=int, default=5, help="rotated files to keep"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="log errors to stderr as well"
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="take hosts as JSON commands on stdin and send their results in batches",
+    )
+    parser.add_argument(
+        "--batch-interval",
+        type=float,
+        default=WORKER_BATCH_INTERVAL,
+        help="seconds between the batches of a worker",
+    )
+    args = parser.parse_args(argv)
+    # Failed polls are part of the output, logging them is optional
+    logging.basicConfig(level=logging.WARNING if args.verbose else logging.CRITICAL)
+
+    if args.worker:
+        try:
+            asyncio.run(serve_worker(args.batch_interval, args.concurrency))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if not (hosts := _read_hosts(args)):
+        parser.error("no hosts given")
+    if args.interval <= 0 or args.concurrency < 1:
+        parser.error("interval and concurrency must be positive")
+    if args.max_bytes and not args.output:
+        parser.error("--max-bytes needs --output, stdout cannot be rotated")
+
+    writer = ReportWriter(args.format, args.output, args.max_bytes, args.backups)
+    try:
+        asyncio.run(
+            poll_hosts(
+                hosts,
+                writer,
+                args.interval,
+                fixed_rate=args.fixed_rate,
+                concurrency=args.concurrency,
+                count=args.count,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Push updates from myStrom devices via their action URLs."""
+from __future__ import annotations
+
+import logging
+import secrets
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+from yarl import URL
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.network import NoURLAvailableError, get_url
+
+from .const import (
+    CONF_PUSH_TOKEN,
+    DATA_PUSH,
+    DEFAULT_LIVENESS_INTERVAL,
+    DOMAIN,
+    PUSH_URL,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import MyStromDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MyStromPushView(HomeAssistantView):
+    """Receive the action URL calls of myStrom switches.
+
+    The devices cannot authenticate, so every entry gets a random token that
+    is part of the URL it calls.
+    """
+
+    url = PUSH_URL
+    name = "api:mystrom_switch:push"
+    requires_auth = False
+
+    def __init__(self, coordinators: dict[str, MyStromDataUpdateCoordinator]) -> None:
+        """Initialize the view."""
+        self._coordinators = coordinators
+
+    async def get(self, request: web.Request, token: str) -> web.Response:
+        """Handle a relay change reported by a device."""
+        if (coordinator := self._coordinators.get(token)) is None:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+
+        relay = request.query.get("relay")
+        if relay not in ("0", "1"):
+            return web.Response(status=HTTPStatus.BAD_REQUEST)
+
+        coordinator.async_push_relay(relay == "1")
+        return web.Response(status=HTTPStatus.OK)
+
+
+async def async_setup_push(
+    hass: HomeAssistant, entry: ConfigEntry, coordinator: MyStromDataUpdateCoordinator
+) -> bool:
+    """Set up push updates for a config entry.
+
+    Registers the entry with the push view and points the device's action
+    URLs at it. On success, polling drops to a slow liveness check. Returns
+    False if the device could not be configured, in which case the entry
+    keeps polling at its normal interval.
+    """
+    try:
+        base_url = URL(get_url(hass, allow_external=False, allow_cloud=False))
+    except NoURLAvailableError:
+        _LOGGER.warning("No local URL available, push updates are disabled")
+        return False
+
+    if (token := entry.data.get(CONF_PUSH_TOKEN)) is None:
+        token = secrets.token_hex(16)
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, CONF_PUSH_TOKEN: token}
+        )
+
+    # myStrom action URLs carry their own scheme prefix instead of http://
+    target = f"get://{base_url.host}:{base_url.port}{PUSH_URL.format(token=token)}"
+    try:
+        info = coordinator.info or await coordinator.async_update_info()
+        await coordinator.api.set_action_urls(
+            info["mac"],
+            {"on": f"{target}?relay=1", "off": f"{target}?relay=0"},
+        )
+    except Exception as err:  # pylint: disable=broad-except
+        _LOGGER.warning(
+            "Could not configure push updates for %s, falling back to polling: %s",
+            coordinator.api.host,
+            err,
+        )
+        return False
+
+    coordinators = _async_get_push_coordinators(hass)
+    coordinators[token] = coordinator
+    entry.async_on_unload(lambda: coordinators.pop(token, None))
+
+    coordinator.async_set_liveness_interval(DEFAULT_LIVENESS_INTERVAL)
+    return True
+
+
+@callback
+def _async_get_push_coordinators(
+    hass: HomeAssistant,
+) -> dict[str, MyStromDataUpdateCoordinator]:
+    """Return the token to coordinator mapping, registering the view once."""
+    domain_data = hass.data[DOMAIN]
+    if DATA_PUSH not in domain_data:
+        domain_data[DATA_PUSH] = {}
+        hass.http.register_view(MyStromPushView(domain_data[DATA_PUSH]))
+    return domain_data[DATA_PUSH]
@@ -0,0 +1,208 @@
+"""Sample history and rolling statistics for the myStrom Switch integration."""
+from __future__ import annotations
+
+import math
+from array import array
+from collections import deque
+
+FIELDS = ("power", "temperature")
+
+
+class SampleRingBuffer:
+    """Fixed-size history of timestamped power and temperature samples.
+
+    A missing value (a device without a temperature sensor) is stored as
+    NaN and left out of the statistics.
+
+    Samples live in preallocated arrays of doubles and are addressed by an
+    ever-increasing sequence number; the slot of sample n is n % capacity.
+    Rolling windows attached to the buffer are updated as samples arrive.
+
+    When the oldest sample is about to be overwritten while a window still
+    covers it, the buffer doubles instead, up to max_capacity. Windows are
+    only truncated once that limit is reached.
+    """
+
+    def __init__(self, capacity: int, max_capacity: int | None = None) -> None:
+        """Initialize the buffer."""
+        self.capacity = capacity
+        self.max_capacity = max(capacity, max_capacity or capacity)
+        self.count = 0
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = {field: array("d", bytes(8 * capacity)) for field in FIELDS}
+        self._windows: dict[tuple[str, float], RollingWindow] = {}
+        self._window_users: dict[tuple[str, float], int] = {}
+
+    def append(
+        self, timestamp: float, power: float, temperature: float | None
+    ) -> None:
+        """Add a sample taken at a monotonic timestamp in seconds."""
+        seq = self.count
+        while (
+            seq >= self.capacity
+            and self.capacity < self.max_capacity
+            and any(
+                window.start <= seq - self.capacity
+                for window in self._windows.values()
+            )
+        ):
+            self._grow()
+        # The slot about to be reused must leave all windows first
+        if seq >= self.capacity:
+            for window in self._windows.values():
+                window.evict_through(seq - self.capacity)
+
+        slot = seq % self.capacity
+        self.timestamps[slot] = timestamp
+        self.values["power"][slot] = power
+        self.values["temperature"][slot] = (
+            math.nan if temperature is None else temperature
+        )
+        self.count = seq + 1
+
+        for window in self._windows.values():
+            window.add(seq, timestamp)
+
+    def _grow(self) -> None:
+        """Double the capacity, keeping the buffered samples."""
+        old_capacity = self.capacity
+        capacity = min(old_capacity * 2, self.max_capacity)
+        first = max(0, self.count - old_capacity)
+
+        def resized(old: array) -> array:
+            new = array("d", bytes(8 * capacity))
+            for seq in range(first, self.count):
+                new[seq % capacity] = old[seq % old_capacity]
+            return new
+
+        self.timestamps = resized(self.timestamps)
+        self.values = {field: resized(values) for field, values in self.values.items()}
+        self.capacity = capacity
+        for window in self._windows.values():
+            window.rebind()
+
+    @property
+    def has_windows(self) -> bool:
+        """Return True while any window is attached."""
+        return bool(self._windows)
+
+    def add_window(self, field: str, seconds: float) -> RollingWindow:
+        """Return the rolling window over a field, creating it if needed."""
+        key = (field, seconds)
+        if key not in self._windows:
+            window = self._windows[key] = RollingWindow(self, field, seconds)
+            for seq in range(max(0, self.count - self.capacity), self.count):
+                window.add(seq, self.timestamps[seq % self.capacity])
+        self._window_users[key] = self._window_users.get(key, 0) + 1
+        return self._windows[key]
+
+    def remove_window(self, window: RollingWindow) -> None:
+        """Release a window returned by add_window."""
+        key = (window.field, window.seconds)
+        self._window_users[key] -= 1
+        if not self._window_users[key]:
+            del self._windows[key], self._window_users[key]
+
+
+class RollingWindow:
+    """Min, max, mean and standard deviation over the last seconds of a field.
+
+    Each sample enters and leaves the window exactly once, so updates are
+    O(1) amortized: running sums give mean and variance, and monotonic
+    deques of sequence numbers give the extremes.
+    """
+
+    def __init__(self, buffer: SampleRingBuffer, field: str, seconds: float) -> None:
+        """Initialize the window."""
+        self.field = field
+        self.seconds = seconds
+        self._buffer = buffer
+        self._values = buffer.values[field]
+        # Start at the oldest sample still in the buffer, add_window replays
+        # the buffered samples into a new window
+        self._start = self._end = max(0, buffer.count - buffer.capacity)
+        # Samples with a value, missing ones only advance the window
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._min: deque[int] = deque()
+        self._max: deque[int] = deque()
+
+    @property
+    def start(self) -> int:
+        """Return the sequence number of the oldest sample in the window."""
+        return self._start
+
+    def rebind(self) -> None:
+        """Follow the buffer to its new arrays after it grew."""
+        self._values = self._buffer.values[self.field]
+
+    def _value(self, seq: int) -> float:
+        """Return the value of a sample."""
+        return self._values[seq % self._buffer.capacity]
+
+    def add(self, seq: int, timestamp: float) -> None:
+        """Add a sample and evict the ones that fell out of the window."""
+        value = self._value(seq)
+        self._end = seq + 1
+        if not math.isnan(value):
+            self._count += 1
+            self._sum += value
+            self._sum_sq += value * value
+            while self._min and self._value(self._min[-1]) >= value:
+                self._min.pop()
+            self._min.append(seq)
+            while self._max and self._value(self._max[-1]) <= value:
+                self._max.pop()
+            self._max.append(seq)
+
+        timestamps = self._buffer.timestamps
+        capacity = self._buffer.capacity
+        while timestamps[self._start % capacity] < timestamp - self.seconds:
+            self._evict()
+
+    def evict_through(self, seq: int) -> None:
+        """Evict all samples up to and including seq."""
+        while self._start <= seq and self._start < self._end:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove the oldest sample of the window."""
+        value = self._value(self._start)
+        if not math.isnan(value):
+            self._count -= 1
+            self._sum -= value
+            self._sum_sq -= value * value
+        if self._min and self._min[0] == self._start:
+            self._min.popleft()
+        if self._max and self._max[0] == self._start:
+            self._max.popleft()
+        self._start += 1
+
+    @property
+    def size(self) -> int:
+        """Return the number of samples with a value in the window."""
+        return self._count
+
+    @property
+    def min(self) -> float | None:
+        """Return the smallest value in the window."""
+        return self._value(self._min[0]) if self._min else None
+
+    @property
+    def max(self) -> float | None:
+        """Return the largest value in the window."""
+        return self._value(self._max[0]) if self._max else None
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean of the window."""
+        return self._sum / self.size if self.size else None
+
+    @property
+    def stddev(self) -> float | None:
+        """Return the population standard deviation of the window."""
+        if not self.size:
+            return None
+        mean = self._sum / self.size
+        return math.sqrt(max(self._sum_sq / self.size - mean * mean, 0.0))
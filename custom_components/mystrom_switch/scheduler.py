@@ -0,0 +1,239 @@
+"""Fleet-wide poll scheduler for the myStrom Switch integration."""
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import math
+import random
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+
+from .const import (
+    BATCH_REFRESH_DELAY,
+    DEFAULT_MAX_CONCURRENT_POLLS,
+    DEFAULT_MAX_POLLS_PER_ACCESS_POINT,
+    DEFAULT_POLL_JITTER,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import MyStromDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Successive multiples of the golden ratio conjugate (mod 1) form a
+# low-discrepancy sequence, so every newly added device lands in the largest
+# gap of the schedule without having to re-balance the devices already in it.
+_GOLDEN_RATIO_CONJUGATE = (math.sqrt(5) - 1) / 2
+
+
+def access_point_group(host: str) -> str:
+    """Return the group used for the per access point concurrency limit.
+
+    Devices are grouped by their /24 network, which on typical installations
+    corresponds to the access point or VLAN they are connected to. Hostnames
+    that are not IP addresses form a group of their own.
+    """
+    try:
+        return str(ipaddress.ip_network(f"{host}/24", strict=False))
+    except ValueError:
+        return host
+
+
+@dataclass
+class _PollSlot:
+    """Scheduling state of a single coordinator."""
+
+    coordinator: MyStromDataUpdateCoordinator
+    group: str
+    next_run: float
+    # Loop time the current run is due, jitter included
+    due: float = 0.0
+    handle: asyncio.TimerHandle | None = None
+    remove_listener: CALLBACK_TYPE | None = None
+
+
+class MyStromPollScheduler:
+    """Drive the polling of all myStrom coordinators.
+
+    Each coordinator gets a fixed phase within its poll interval, so the polls
+    of the fleet are spread evenly over time instead of firing in a burst. A
+    small random jitter is added to every run, and the number of concurrent
+    requests is capped globally and per access point.
+
+    Out-of-schedule refreshes (confirming switch commands, replacing cached
+    data at startup) are coalesced: all refreshes requested within
+    BATCH_REFRESH_DELAY seconds run together, concurrently.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT_POLLS,
+        max_per_group: int = DEFAULT_MAX_POLLS_PER_ACCESS_POINT,
+        jitter: float = DEFAULT_POLL_JITTER,
+    ) -> None:
+        """Initialize the scheduler."""
+        self._hass = hass
+        self._max_per_group = max_per_group
+        self._jitter = jitter
+        self._slots: dict[str, _PollSlot] = {}
+        self._sequence = 0
+        self._global_limit = asyncio.Semaphore(max_concurrent)
+        self._group_limits: dict[str, asyncio.Semaphore] = {}
+        self._pending_refreshes: set[str] = set()
+        self._batch_refresh_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=BATCH_REFRESH_DELAY,
+            immediate=False,
+            function=self._async_batch_refresh,
+        )
+
+    @callback
+    def async_add(
+        self,
+        key: str,
+        coordinator: MyStromDataUpdateCoordinator,
+        group: str,
+        scheduled: bool = True,
+    ) -> CALLBACK_TYPE:
+        """Add a coordinator to the schedule and return a remove callback.
+
+        An unscheduled coordinator, e.g. one fed by a poll worker, is only
+        refreshed on request, within the same limits.
+        """
+        phase = (self._sequence * _GOLDEN_RATIO_CONJUGATE) % 1.0
+        self._sequence += 1
+
+        interval = coordinator.poll_interval.total_seconds()
+        slot = _PollSlot(
+            coordinator=coordinator,
+            group=group,
+            next_run=self._hass.loop.time() + phase * interval,
+        )
+        self._slots[key] = slot
+        slot.remove_listener = coordinator.async_add_listener(
+            partial(self._async_coordinator_updated, key)
+        )
+        if scheduled:
+            self._schedule(key, slot)
+
+        return partial(self._async_remove, key)
+
+    @callback
+    def _async_remove(self, key: str) -> None:
+        """Remove a coordinator from the schedule."""
+        if (slot := self._slots.pop(key, None)) is None:
+            return
+        if slot.handle:
+            slot.handle.cancel()
+        if slot.remove_listener:
+            slot.remove_listener()
+
+    @callback
+    def _async_coordinator_updated(self, key: str) -> None:
+        """Bring the next poll forward if the poll interval got shorter.
+
+        Refreshes outside the schedule (after commands or pushes) may shorten
+        the interval of an adaptive coordinator. Waiting for a run that was
+        planned with the old, longer interval would miss the activity.
+        """
+        self.async_reschedule(key)
+
+    @callback
+    def async_reschedule(self, key: str) -> None:
+        """Bring the next poll forward if the poll interval got shorter."""
+        if (slot := self._slots.get(key)) is None or slot.handle is None:
+            return
+        interval = slot.coordinator.poll_interval.total_seconds()
+        next_run = self._hass.loop.time() + interval
+        if next_run < slot.next_run:
+            slot.handle.cancel()
+            slot.next_run = next_run
+            self._schedule(key, slot)
+
+    @callback
+    def async_request_batch_refresh(self, key: str) -> None:
+        """Request a coalesced refresh of a coordinator."""
+        self._pending_refreshes.add(key)
+        self._hass.async_create_task(self._batch_refresh_debouncer.async_call())
+
+    async def _async_batch_refresh(self) -> None:
+        """Refresh all coordinators with pending refresh requests."""
+        keys = self._pending_refreshes
+        self._pending_refreshes = set()
+        slots = [slot for key in keys if (slot := self._slots.get(key)) is not None]
+        await asyncio.gather(*(self._async_refresh(slot) for slot in slots))
+
+    @callback
+    def async_shutdown(self, event: Event | None = None) -> None:
+        """Cancel all scheduled polls."""
+        self._batch_refresh_debouncer.async_cancel()
+        for key in list(self._slots):
+            self._async_remove(key)
+
+    def _group_limit(self, group: str) -> asyncio.Semaphore:
+        """Return the semaphore limiting the concurrent polls of a group."""
+        if (limit := self._group_limits.get(group)) is None:
+            limit = self._group_limits[group] = asyncio.Semaphore(
+                self._max_per_group
+            )
+        return limit
+
+    @callback
+    def _schedule(self, key: str, slot: _PollSlot) -> None:
+        """Arm the timer for the next poll of a slot."""
+        loop = self._hass.loop
+        when = slot.next_run + random.uniform(-self._jitter, self._jitter)
+        slot.due = max(when, loop.time())
+        slot.handle = loop.call_at(slot.due, self._fire, key)
+
+    @callback
+    def _fire(self, key: str) -> None:
+        """Start the poll of a slot."""
+        if (slot := self._slots.get(key)) is None:
+            return
+        slot.handle = None
+        self._hass.async_create_background_task(
+            self._async_poll(key, slot), f"{slot.coordinator.name} poll"
+        )
+
+    async def _async_refresh(self, slot: _PollSlot, due: float | None = None) -> None:
+        """Refresh a coordinator within the concurrency limits.
+
+        For scheduled runs the delay between the due time and the start of
+        the request (event loop lag and waiting for the limits) is recorded
+        as the poll drift of the coordinator.
+        """
+        # Acquire the group first so a busy access point does not hold on to
+        # global slots other groups could use in the meantime.
+        async with self._group_limit(slot.group), self._global_limit:
+            if due is not None:
+                slot.coordinator.poll_drift.record(self._hass.loop.time() - due)
+            await slot.coordinator.async_refresh()
+
+    async def _async_poll(self, key: str, slot: _PollSlot) -> None:
+        """Poll a coordinator and schedule its next run."""
+        try:
+            await self._async_refresh(slot, slot.due)
+        finally:
+            if self._slots.get(key) is slot:
+                self._advance(slot)
+                self._schedule(key, slot)
+
+    def _advance(self, slot: _PollSlot) -> None:
+        """Move a slot to its next run, skipping runs that were missed."""
+        interval = slot.coordinator.poll_interval.total_seconds()
+        slot.next_run += interval
+        if (behind := self._hass.loop.time() - slot.next_run) > 0:
+            _LOGGER.debug(
+                "%s is %.1fs behind schedule, skipping missed polls",
+                slot.coordinator.name,
+                behind,
+            )
+            slot.next_run += math.ceil(behind / interval) * interval
@@ -2,8 +2,10 @@
 from __future__ import annotations
 
 import logging
+import time
 
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
@@ -12,18 +14,66 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     CONF_HOST,
     CONF_NAME,
+    EntityCategory,
     UnitOfEnergy,
+    UnitOfInformation,
     UnitOfPower,
     UnitOfTemperature,
+    UnitOfTime,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
+from .const import (
+    CONF_ENERGY_DEADBAND,
+    CONF_MAX_WRITE_INTERVAL,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_POWER_DEADBAND,
+    CONF_STATISTICS_WINDOWS,
+    CONF_TEMPERATURE_DEADBAND,
+    DEFAULT_MAX_WRITE_INTERVAL,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_STATISTICS_WINDOWS,
+    DOMAIN,
+)
+from .mystrom_api import ENDPOINT_REPORT
 
 _LOGGER = logging.getLogger(__name__)
 
+STATISTICS = ("min", "max", "mean", "stddev")
+STATISTIC_FIELDS = {
+    "power": (SensorDeviceClass.POWER, UnitOfPower.WATT, CONF_POWER_DEADBAND),
+    "temperature": (
+        SensorDeviceClass.TEMPERATURE,
+        UnitOfTemperature.CELSIUS,
+        CONF_TEMPERATURE_DEADBAND,
+    ),
+}
+
+# Key: (name, device class, unit, state class)
+DIAGNOSTIC_SENSORS = {
+    "report_latency": (
+        "Report latency",
+        SensorDeviceClass.DURATION,
+        UnitOfTime.MILLISECONDS,
+        SensorStateClass.MEASUREMENT,
+    ),
+    "poll_drift": (
+        "Poll drift",
+        SensorDeviceClass.DURATION,
+        UnitOfTime.MILLISECONDS,
+        SensorStateClass.MEASUREMENT,
+    ),
+    "request_errors": ("Request errors", None, None, SensorStateClass.TOTAL_INCREASING),
+    "data_received": (
+        "Data received",
+        SensorDeviceClass.DATA_SIZE,
+        UnitOfInformation.BYTES,
+        SensorStateClass.TOTAL_INCREASING,
+    ),
+}
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -31,30 +81,54 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up myStrom sensors based on a config entry."""
-    from .const import CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
-
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator = data["coordinator"]
-    scan_interval = entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
 
     sensors = [
         MyStromPowerSensor(coordinator, entry),
-        MyStromEnergySensor(coordinator, entry, scan_interval),
+        MyStromEnergySensor(coordinator, entry),
         MyStromTemperatureSensor(coordinator, entry),
     ]
 
+    windows = entry.options.get(CONF_STATISTICS_WINDOWS, DEFAULT_STATISTICS_WINDOWS)
+    sensors.extend(
+        MyStromStatisticSensor(coordinator, entry, field, statistic, window)
+        for field in STATISTIC_FIELDS
+        for statistic in STATISTICS
+        for window in windows
+    )
+    sensors.extend(
+        MyStromDiagnosticSensor(coordinator, entry, key) for key in DIAGNOSTIC_SENSORS
+    )
+
     async_add_entities(sensors, True)
 
 
 class MyStromSensorBase(CoordinatorEntity, SensorEntity):
-    """Base class for myStrom sensors."""
+    """Base class for myStrom sensors.
+
+    Coordinator updates only write the state if the value moved beyond the
+    sensor's deadband, no sooner than the minimum write interval after the
+    last write. The maximum write interval forces a write of small changes
+    eventually. Availability changes are always written. The deadbands are
+    kept by the coordinator, so a profile change applies right away.
+    """
 
     _attr_has_entity_name = True
+    _deadband_option: str | None = None
 
     def __init__(self, coordinator, entry: ConfigEntry) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
         self._entry = entry
+        self._min_write_interval = entry.options.get(
+            CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL
+        )
+        self._max_write_interval = entry.options.get(
+            CONF_MAX_WRITE_INTERVAL, DEFAULT_MAX_WRITE_INTERVAL
+        )
+        self._written: tuple[bool, float | None] | None = None
+        self._written_at = 0.0
         device_name = entry.data.get(CONF_NAME, "myStrom Switch")
         self._attr_device_info = {
             "identifiers": {(DOMAIN, entry.entry_id)},
@@ -63,12 +137,50 @@ class MyStromSensorBase(CoordinatorEntity, SensorEntity):
             "model": "WiFi Switch",
             "configuration_url": f"http://{entry.data[CONF_HOST]}",
         }
+        if coordinator.info:
+            self._attr_device_info["sw_version"] = coordinator.info.get("version")
 
     @property
     def available(self) -> bool:
         """Return if entity is available."""
         return self.coordinator.last_update_success
 
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state and remember what was written."""
+        self._written = (self.available, self.native_value)
+        self._written_at = time.monotonic()
+        super().async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state if the update is significant."""
+        if self._should_write():
+            self.async_write_ha_state()
+
+    def _should_write(self) -> bool:
+        """Return True if the current value should be written."""
+        if self._written is None:
+            return True
+        written_available, written_value = self._written
+        value = self.native_value
+        if self.available != written_available:
+            return True
+        if value == written_value:
+            return False
+
+        elapsed = time.monotonic() - self._written_at
+        if elapsed < self._min_write_interval:
+            return False
+        if value is None or written_value is None:
+            return True
+        if self._max_write_interval and elapsed >= self._max_write_interval:
+            return True
+        absolute, relative = self.coordinator.deadbands.get(
+            self._deadband_option, (0.0, 0.0)
+        )
+        return abs(value - written_value) > max(absolute, relative * abs(written_value))
+
 
 class MyStromPowerSensor(MyStromSensorBase):
     """Representation of myStrom power consumption sensor."""
@@ -77,6 +189,7 @@ class MyStromPowerSensor(MyStromSensorBase):
     _attr_native_unit_of_measurement = UnitOfPower.WATT
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_suggested_display_precision = 1
+    _deadband_option = CONF_POWER_DEADBAND
 
     def __init__(self, coordinator, entry: ConfigEntry) -> None:
         """Initialize the power sensor."""
@@ -88,47 +201,44 @@ class MyStromPowerSensor(MyStromSensorBase):
     def native_value(self) -> float | None:
         """Return the current power consumption."""
         if self.coordinator.data:
-            return self.coordinator.data.get("power", 0.0)
+            return self.coordinator.data.power
         return None
 
 
-class MyStromEnergySensor(MyStromSensorBase):
-    """Representation of myStrom energy consumption sensor."""
+class MyStromEnergySensor(MyStromSensorBase, RestoreSensor):
+    """Representation of myStrom energy consumption sensor.
+
+    The energy is integrated by the coordinator on every poll, the sensor
+    only reports the running total.
+    """
 
     _attr_device_class = SensorDeviceClass.ENERGY
     _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
     _attr_state_class = SensorStateClass.TOTAL_INCREASING
     _attr_suggested_display_precision = 2
+    _deadband_option = CONF_ENERGY_DEADBAND
 
-    def __init__(self, coordinator, entry: ConfigEntry, scan_interval: int) -> None:
+    def __init__(self, coordinator, entry: ConfigEntry) -> None:
         """Initialize the energy sensor."""
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_energy"
         self._attr_name = "Energy"
-        self._total_energy = 0.0
-        self._last_power = 0.0
-        self._scan_interval = scan_interval
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the total from the last state if nothing was persisted."""
+        await super().async_added_to_hass()
+        if self.coordinator.energy_restored:
+            return
+        if (last := await self.async_get_last_sensor_data()) is not None and (
+            last.native_value is not None
+        ):
+            self.coordinator.async_restore_energy(float(last.native_value))
 
     @property
     def native_value(self) -> float | None:
-        """Return the total energy consumption in kWh.
-
-        This calculates cumulative energy based on power readings.
-        Energy (kWh) = Power (W) × Time (h) / 1000
-        """
+        """Return the total energy consumption in kWh."""
         if self.coordinator.data:
-            current_power = self.coordinator.data.get("power", 0.0)
-
-            # Simple integration: assume linear power consumption between readings
-            if self._last_power > 0 or current_power > 0:
-                avg_power = (self._last_power + current_power) / 2
-                # Energy = Power (W) * Time (seconds) / 3600 (to hours) / 1000 (to kWh)
-                time_hours = self._scan_interval / 3600.0
-                energy_increment = (avg_power * time_hours) / 1000.0
-                self._total_energy += energy_increment
-
-            self._last_power = current_power
-            return round(self._total_energy, 3)
+            return round(self.coordinator.energy.total, 3)
         return None
 
 
@@ -139,6 +249,7 @@ class MyStromTemperatureSensor(MyStromSensorBase):
     _attr_native_unit_of_measurement = UnitOfTemperature.CELSIUS
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_suggested_display_precision = 1
+    _deadband_option = CONF_TEMPERATURE_DEADBAND
 
     def __init__(self, coordinator, entry: ConfigEntry) -> None:
         """Initialize the temperature sensor."""
@@ -150,5 +261,103 @@ class MyStromTemperatureSensor(MyStromSensorBase):
     def native_value(self) -> float | None:
         """Return the current temperature."""
         if self.coordinator.data:
-            return self.coordinator.data.get("temperature", 0.0)
+            return self.coordinator.data.temperature
         return None
+
+
+class MyStromStatisticSensor(MyStromSensorBase):
+    """Rolling statistic of the power or temperature of a myStrom switch.
+
+    The sensors are disabled by default. Only enabled sensors attach a
+    rolling window to the coordinator's sample history, so disabled ones
+    cost nothing.
+    """
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_suggested_display_precision = 1
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self, coordinator, entry: ConfigEntry, field: str, statistic: str, window: int
+    ) -> None:
+        """Initialize the statistic sensor."""
+        self._deadband_option = STATISTIC_FIELDS[field][2]
+        super().__init__(coordinator, entry)
+        self._field = field
+        self._statistic = statistic
+        self._window_minutes = window
+        self._window = None
+        self._attr_device_class, self._attr_native_unit_of_measurement, _ = (
+            STATISTIC_FIELDS[field]
+        )
+        self._attr_unique_id = f"{entry.entry_id}_{field}_{statistic}_{window}"
+        self._attr_name = f"{field.capitalize()} {statistic} {window} min"
+
+    async def async_added_to_hass(self) -> None:
+        """Attach the rolling window while the sensor is in use."""
+        await super().async_added_to_hass()
+        coordinator = self.coordinator
+        self._window = coordinator.async_add_window(
+            self._field, self._window_minutes * 60
+        )
+        self.async_on_remove(lambda: coordinator.async_remove_window(self._window))
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the statistic over the window."""
+        if self._window is None:
+            return None
+        return getattr(self._window, self._statistic)
+
+
+class MyStromDiagnosticSensor(MyStromSensorBase):
+    """Request and scheduling performance of a myStrom switch.
+
+    Latency and drift are the 95th percentile of the last 10 to 20 minutes,
+    taken from the histograms kept by the API client (or sent by the poll
+    worker) and the coordinator; the percentiles since startup are in the
+    diagnostics. The sensors
+    are disabled by default and stay available while the device is not,
+    so the error counter keeps counting.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator, entry: ConfigEntry, key: str) -> None:
+        """Initialize the diagnostic sensor."""
+        super().__init__(coordinator, entry)
+        self._key = key
+        (
+            self._attr_name,
+            self._attr_device_class,
+            self._attr_native_unit_of_measurement,
+            self._attr_state_class,
+        ) = DIAGNOSTIC_SENSORS[key]
+        self._attr_unique_id = f"{entry.entry_id}_{key}"
+
+    @property
+    def available(self) -> bool:
+        """Return True, the counters are meaningful without the device."""
+        return True
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the current value."""
+        api = self.coordinator.api
+        # Polled by a worker, the reports are requested in the worker process
+        worker = self.coordinator.worker
+        if self._key == "report_latency":
+            if worker is not None:
+                latency = worker.latency
+            else:
+                latency = api.stats[ENDPOINT_REPORT].latency.recent_percentile(0.95)
+        elif self._key == "poll_drift":
+            latency = self.coordinator.poll_drift.recent_percentile(0.95)
+        elif self._key == "request_errors":
+            errors = sum(stats.errors + stats.timeouts for stats in api.stats.values())
+            return errors + worker.request_errors if worker is not None else errors
+        else:
+            received = sum(stats.bytes_received for stats in api.stats.values())
+            return received + worker.data_received if worker is not None else received
+        return round(latency * 1000) if latency is not None else None
@@ -0,0 +1,187 @@
+"""Services for the myStrom Switch integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_AREA_ID, CONF_NAME
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import (
+    config_validation as cv,
+    device_registry as dr,
+    entity_registry as er,
+)
+
+from .const import (
+    ATTR_ACTION,
+    ATTR_ALL,
+    ATTR_ENTRY_ID,
+    ATTR_PROFILE,
+    BULK_COMMAND_TIMEOUT,
+    BULK_MAX_CONCURRENT,
+    CONF_PROFILE,
+    DATA_SCHEDULER,
+    DOMAIN,
+    PROFILE_CUSTOM,
+    PROFILES,
+    SERVICE_BULK_SET,
+    SERVICE_SET_PROFILE,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+_COMMANDS = {"on": "turn_on", "off": "turn_off", "toggle": "toggle"}
+
+_TARGET_FIELDS = {
+    vol.Optional(ATTR_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_AREA_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_ALL, default=False): cv.boolean,
+}
+
+
+def _has_target(data: dict[str, Any]) -> dict[str, Any]:
+    """Require entries, areas or an explicit all: true.
+
+    A call that forgot its target must not switch the whole fleet.
+    """
+    if not (data.get(ATTR_ENTRY_ID) or data.get(ATTR_AREA_ID) or data[ATTR_ALL]):
+        raise vol.Invalid("Select devices or areas, or set all: true")
+    return data
+
+
+BULK_SET_SCHEMA = vol.All(
+    vol.Schema({vol.Required(ATTR_ACTION): vol.In(list(_COMMANDS)), **_TARGET_FIELDS}),
+    _has_target,
+)
+
+SET_PROFILE_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_PROFILE): vol.In([PROFILE_CUSTOM, *PROFILES]),
+            **_TARGET_FIELDS,
+        }
+    ),
+    _has_target,
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def async_bulk_set(call: ServiceCall) -> ServiceResponse:
+        """Switch many devices at once with bounded concurrency."""
+        if (scheduler := hass.data.get(DOMAIN, {}).get(DATA_SCHEDULER)) is None:
+            raise ServiceValidationError("No myStrom devices are loaded")
+        entry_ids = _async_resolve_entries(
+            hass, call.data.get(ATTR_ENTRY_ID), call.data.get(ATTR_AREA_ID)
+        )
+        action = call.data[ATTR_ACTION]
+        limit = asyncio.Semaphore(BULK_MAX_CONCURRENT)
+
+        async def async_set(entry_id: str) -> tuple[str, dict[str, Any]]:
+            coordinator = hass.data[DOMAIN][entry_id]["coordinator"]
+            api = hass.data[DOMAIN][entry_id]["api"]
+            command = getattr(api, _COMMANDS[action])
+            async with limit:
+                start = time.monotonic()
+                try:
+                    async with asyncio.timeout(BULK_COMMAND_TIMEOUT):
+                        success = await command()
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.debug("bulk_set %s failed on %s", action, api.host)
+                    success = False
+                latency = time.monotonic() - start
+
+            if success:
+                coordinator.async_note_command()
+            entry = hass.config_entries.async_get_entry(entry_id)
+            return entry_id, {
+                "name": entry.data.get(CONF_NAME, entry.title),
+                "host": api.host,
+                "success": success,
+                "latency": round(latency, 3),
+            }
+
+        results = dict(await asyncio.gather(*(async_set(e) for e in entry_ids)))
+
+        # One coalesced refresh for all devices that accepted the command
+        for entry_id, result in results.items():
+            if result["success"]:
+                scheduler.async_request_batch_refresh(entry_id)
+
+        return {"results": results}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BULK_SET,
+        async_bulk_set,
+        schema=BULK_SET_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    @callback
+    def async_set_profile(call: ServiceCall) -> None:
+        """Switch the polling profile of many devices at once.
+
+        The profile is stored in the options of each entry, whose update
+        listeners apply it to the running coordinator and sensors.
+        """
+        profile = call.data[ATTR_PROFILE]
+        for entry_id in _async_resolve_entries(
+            hass, call.data.get(ATTR_ENTRY_ID), call.data.get(ATTR_AREA_ID)
+        ):
+            entry = hass.config_entries.async_get_entry(entry_id)
+            if entry.options.get(CONF_PROFILE) != profile:
+                hass.config_entries.async_update_entry(
+                    entry, options={**entry.options, CONF_PROFILE: profile}
+                )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_PROFILE, async_set_profile, schema=SET_PROFILE_SCHEMA
+    )
+
+
+@callback
+def _async_resolve_entries(
+    hass: HomeAssistant, entry_ids: list[str] | None, area_ids: list[str] | None
+) -> list[str]:
+    """Return the loaded entries matching the given entries and areas.
+
+    Without any filter (all: true), all loaded entries are returned. A device matches an
+    area if either the device or its switch entity is assigned to it.
+    """
+    loaded = [
+        entry.entry_id
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if entry.entry_id in hass.data.get(DOMAIN, {})
+    ]
+    if not entry_ids and not area_ids:
+        return loaded
+
+    selected = {entry_id for entry_id in loaded if entry_id in (entry_ids or ())}
+    if area_ids:
+        device_registry = dr.async_get(hass)
+        entity_registry = er.async_get(hass)
+        for entry_id in loaded:
+            device = device_registry.async_get_device(identifiers={(DOMAIN, entry_id)})
+            entity_id = entity_registry.async_get_entity_id(
+                "switch", DOMAIN, f"{entry_id}_switch"
+            )
+            entity = entity_registry.async_get(entity_id) if entity_id else None
+            if (device and device.area_id in area_ids) or (
+                entity and entity.area_id in area_ids
+            ):
+                selected.add(entry_id)
+    return [entry_id for entry_id in loaded if entry_id in selected]
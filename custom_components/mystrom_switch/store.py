@@ -0,0 +1,35 @@
+"""Storage helpers for the myStrom Switch integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import TypeVar
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+_T = TypeVar("_T")
+
+
+class ThrottledStore(Store[_T]):
+    """Store whose delayed save is not postponed by further requests.
+
+    Store.async_delay_save restarts its timer on every call, so data that
+    changes on every poll would only be written at shutdown. Here a pending
+    save is kept; it writes the latest data once its delay is over.
+    """
+
+    _save_pending = False
+
+    @callback
+    def async_delay_save(self, data_func: Callable[[], _T], delay: float = 0) -> None:
+        """Save data after a delay, unless a save is already pending."""
+        if self._save_pending:
+            return
+        self._save_pending = True
+
+        @callback
+        def _data() -> _T:
+            self._save_pending = False
+            return data_func()
+
+        super().async_delay_save(_data, delay)
@@ -2,16 +2,24 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import Any
 
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, CONF_NAME
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
+from .const import (
+    CONF_OPTIMISTIC,
+    CONF_SWITCH_ATTRIBUTES,
+    DATA_SCHEDULER,
+    DEFAULT_OPTIMISTIC,
+    DEFAULT_SWITCH_ATTRIBUTES,
+    DOMAIN,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -26,20 +34,38 @@ async def async_setup_entry(
     coordinator = data["coordinator"]
     api = data["api"]
 
-    async_add_entities([MyStromSwitch(coordinator, api, entry)], True)
+    optimistic = entry.options.get(CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC)
+
+    async_add_entities([MyStromSwitch(coordinator, api, entry, optimistic)], True)
 
 
 class MyStromSwitch(CoordinatorEntity, SwitchEntity):
-    """Representation of a myStrom WiFi Switch."""
+    """Representation of a myStrom WiFi Switch.
+
+    In optimistic mode the state follows a command as soon as the device has
+    accepted it. A coalesced confirmation poll follows, and the state rolls
+    back to what the device reports if the two disagree.
+    """
 
     _attr_has_entity_name = True
     _attr_name = None
+    # Change with every command or outage, not worth a state row in the recorder
+    _unrecorded_attributes = frozenset(
+        {"circuit_breaker", "command_latency", "commands_queued"}
+    )
 
-    def __init__(self, coordinator, api, entry: ConfigEntry) -> None:
+    def __init__(self, coordinator, api, entry: ConfigEntry, optimistic: bool) -> None:
         """Initialize the switch."""
         super().__init__(coordinator)
         self._api = api
         self._entry = entry
+        self._optimistic = optimistic
+        self._optimistic_state: bool | None = None
+        self._optimistic_since = 0.0
+        # Power and temperature duplicate the sensors, optionally leave them out
+        self._duplicate_attributes = entry.options.get(
+            CONF_SWITCH_ATTRIBUTES, DEFAULT_SWITCH_ATTRIBUTES
+        )
         self._attr_unique_id = f"{entry.entry_id}_switch"
         device_name = entry.data.get(CONF_NAME, "myStrom Switch")
         self._attr_device_info = {
@@ -49,12 +75,16 @@ class MyStromSwitch(CoordinatorEntity, SwitchEntity):
             "model": "WiFi Switch",
             "configuration_url": f"http://{entry.data[CONF_HOST]}",
         }
+        if coordinator.info:
+            self._attr_device_info["sw_version"] = coordinator.info.get("version")
 
     @property
     def is_on(self) -> bool:
         """Return true if switch is on."""
+        if self._optimistic_state is not None:
+            return self._optimistic_state
         if self.coordinator.data:
-            return self.coordinator.data.get("relay", False)
+            return self.coordinator.data.relay
         return False
 
     @property
@@ -68,22 +98,62 @@ class MyStromSwitch(CoordinatorEntity, SwitchEntity):
         if not self.coordinator.data:
             return {}
 
-        return {
-            "power": self.coordinator.data.get("power", 0),
-            "temperature": self.coordinator.data.get("temperature", 0),
-        }
+        attributes = {"circuit_breaker": self._api.breaker.state}
+        commands = self._api.commands
+        if commands.busy:
+            attributes["commands_queued"] = commands.depth
+        if commands.last_latency is not None:
+            attributes["command_latency"] = round(commands.last_latency * 1000)
+        if self.coordinator.stale:
+            attributes["stale"] = True
+        if self._duplicate_attributes:
+            attributes["power"] = self.coordinator.data.power
+            attributes["temperature"] = self.coordinator.data.temperature
+        return attributes
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Drop the optimistic state once the device confirmed or rejected it."""
+        if (
+            self._optimistic_state is not None
+            and self.coordinator.data_requested_at >= self._optimistic_since
+        ):
+            if self.coordinator.data and (
+                self.coordinator.data.relay != self._optimistic_state
+            ):
+                _LOGGER.debug(
+                    "%s did not confirm the relay state, rolling back",
+                    self.entity_id,
+                )
+            self._optimistic_state = None
+        super()._handle_coordinator_update()
+
+    async def _async_command_sent(self, state: bool) -> None:
+        """Update the state after the device accepted a command."""
+        self.coordinator.async_note_command()
+        if not self._optimistic:
+            await self.coordinator.async_request_refresh()
+            return
+
+        self._optimistic_state = state
+        self._optimistic_since = time.monotonic()
+        self.async_write_ha_state()
+        self.hass.data[DOMAIN][DATA_SCHEDULER].async_request_batch_refresh(
+            self._entry.entry_id
+        )
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn the switch on."""
         if await self._api.turn_on():
-            await self.coordinator.async_request_refresh()
+            await self._async_command_sent(True)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn the switch off."""
         if await self._api.turn_off():
-            await self.coordinator.async_request_refresh()
+            await self._async_command_sent(False)
 
     async def async_toggle(self, **kwargs: Any) -> None:
         """Toggle the switch."""
+        state = not self.is_on
         if await self._api.toggle():
-            await self.coordinator.async_request_refresh()
+            await self._async_command_sent(state)
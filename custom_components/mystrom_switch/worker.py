@@ -0,0 +1,414 @@
+"""Out-of-process polling for the myStrom Switch integration."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sys
+import time
+import zlib
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import (
+    DEFAULT_WORKER_PROCESSES,
+    WORKER_POLL_TIMEOUT,
+    WORKER_RESTART_DELAY,
+    WORKER_WATCHDOG_INTERVAL,
+    WORKER_WATCHDOG_POLLS,
+)
+from .mystrom_api import (
+    WORKER_BATCH_INTERVAL,
+    MyStromReport,
+    MyStromReportError,
+    json_loads,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+_WORKER_SCRIPT = Path(__file__).with_name("mystrom_api.py")
+# A batch from a large fleet is one long line
+_LINE_LIMIT = 2**24
+
+WorkerUpdateCallback = Callable[[float, MyStromReport | None, str | None], None]
+
+
+class PollWorkerError(Exception):
+    """Error to indicate a poll through a worker failed."""
+
+
+class MyStromPollWorkers:
+    """Pool of processes polling devices on behalf of the coordinators.
+
+    Every process runs mystrom_api.py in worker mode (see PollWorker) and
+    polls a fixed shard of the hosts. The results come back in one line per
+    batch interval, so the event loop decodes a single line per process and
+    batch instead of handling every request; every result is still passed
+    on, as energy, samples and cycles need each one. The request statistics
+    of the worker are kept on the subscriptions for the diagnostic sensors.
+    A process is started on first use and restarted with its hosts if it
+    dies.
+
+    When a process dies, or a host goes WORKER_WATCHDOG_POLLS poll
+    intervals without a result, its coordinators get an error, so their
+    entities become unavailable instead of showing the last report. A
+    process none of whose hosts get results any more is killed and
+    restarted.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        processes: int = DEFAULT_WORKER_PROCESSES,
+        batch_interval: float = WORKER_BATCH_INTERVAL,
+    ) -> None:
+        """Initialize the pool."""
+        self._processes = [
+            _PollWorkerProcess(hass, index, batch_interval)
+            for index in range(processes)
+        ]
+
+    @callback
+    def async_subscribe(
+        self,
+        host: str,
+        interval: float,
+        timeout: float | None,
+        update_callback: WorkerUpdateCallback,
+    ) -> PollWorkerSubscription:
+        """Poll a host in its worker and pass the results to a callback.
+
+        Without a timeout, the worker's default request timeouts apply.
+        """
+        process = self._processes[zlib.crc32(host.encode()) % len(self._processes)]
+        subscription = PollWorkerSubscription(
+            process, host, interval, timeout, update_callback
+        )
+        process.async_add(subscription)
+        return subscription
+
+    async def async_shutdown(self, event: Event | None = None) -> None:
+        """Stop all processes."""
+        await asyncio.gather(*(process.async_stop() for process in self._processes))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the processes for diagnostics."""
+        return {"processes": [process.as_dict() for process in self._processes]}
+
+
+class PollWorkerSubscription:
+    """A host polled by a worker process."""
+
+    def __init__(
+        self,
+        process: _PollWorkerProcess,
+        host: str,
+        interval: float,
+        timeout: float | None,
+        update_callback: WorkerUpdateCallback,
+    ) -> None:
+        """Initialize the subscription."""
+        self.host = host
+        self.interval = interval
+        self.timeout = timeout
+        self._process = process
+        self._update_callback = update_callback
+        self.waiters: list[asyncio.Future[MyStromReport]] = []
+        # Monotonic time of the last result, or of the (re)start
+        self.received_at = time.monotonic()
+        # Request statistics of the worker, the counters survive its restarts
+        self.latency: float | None = None
+        self.request_errors = 0
+        self.data_received = 0
+        self._counted = (0, 0)
+
+    @property
+    def command(self) -> dict[str, Any]:
+        """Return the command that adds the host to a worker."""
+        return {
+            "op": "add",
+            "host": self.host,
+            "interval": self.interval,
+            "timeout": self.timeout,
+        }
+
+    @callback
+    def async_set_interval(self, interval: float, timeout: float | None) -> None:
+        """Change the poll interval and request timeout of the host."""
+        if (interval, timeout) != (self.interval, self.timeout):
+            self.interval = interval
+            self.timeout = timeout
+            self._process.async_send({**self.command, "op": "interval"})
+
+    async def async_poll(self) -> MyStromReport:
+        """Let the worker poll the host now and return the report."""
+        waiter: asyncio.Future[MyStromReport] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.waiters.append(waiter)
+        self._process.async_send({"op": "poll", "host": self.host})
+        try:
+            async with asyncio.timeout(WORKER_POLL_TIMEOUT):
+                return await waiter
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    @callback
+    def async_remove(self) -> None:
+        """Stop polling the host."""
+        self._process.async_remove(self)
+        self.async_fail_waiters("stopped")
+
+    @callback
+    def async_deliver(
+        self,
+        requested_at: float,
+        report: MyStromReport | None,
+        error: str | None,
+        polled: bool,
+    ) -> None:
+        """Pass a result to the pending polls or to the callback."""
+        self.received_at = time.monotonic()
+        if polled and self.waiters:
+            waiters, self.waiters = self.waiters, []
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if report is None:
+                    waiter.set_exception(PollWorkerError(error))
+                else:
+                    waiter.set_result(report)
+            return
+        self._update_callback(requested_at, report, error)
+
+    @callback
+    def async_update_stats(
+        self, latency: float | None, errors: int, received: int
+    ) -> None:
+        """Take the request statistics sent by the worker."""
+        counted_errors, counted_received = self._counted
+        self.latency = latency
+        self.request_errors += errors - counted_errors
+        self.data_received += received - counted_received
+        self._counted = (errors, received)
+
+    @callback
+    def async_restarted(self) -> None:
+        """Note that the worker was (re)started and counts from 0 again."""
+        self.received_at = time.monotonic()
+        self._counted = (0, 0)
+
+    @callback
+    def async_fail(self, error: str) -> None:
+        """Fail the pending polls and pass the error to the callback."""
+        self.async_fail_waiters(error)
+        self._update_callback(time.monotonic(), None, error)
+
+    def overdue(self, now: float) -> bool:
+        """Return True if the last result is older than a few poll intervals."""
+        return (
+            now - self.received_at
+            > WORKER_WATCHDOG_POLLS * self.interval + WORKER_POLL_TIMEOUT
+        )
+
+    @callback
+    def async_fail_waiters(self, error: str) -> None:
+        """Fail the pending polls, e.g. when the worker died."""
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_exception(PollWorkerError(error))
+
+
+class _PollWorkerProcess:
+    """One worker process and the hosts it polls."""
+
+    def __init__(self, hass: HomeAssistant, index: int, batch_interval: float) -> None:
+        """Initialize the process."""
+        self._hass = hass
+        self._index = index
+        self._batch_interval = batch_interval
+        self._subscriptions: dict[str, PollWorkerSubscription] = {}
+        self._process: asyncio.subprocess.Process | None = None
+        self._task: asyncio.Task | None = None
+        self._unsub_watchdog: CALLBACK_TYPE | None = None
+        self._stopping = False
+        self.restarts = 0
+        self.batches = 0
+        self.records = 0
+
+    @callback
+    def async_add(self, subscription: PollWorkerSubscription) -> None:
+        """Start polling a host, starting the process on first use."""
+        self._subscriptions[subscription.host] = subscription
+        if self._task is None:
+            self._task = self._hass.async_create_background_task(
+                self._async_run(), f"myStrom poll worker {self._index}"
+            )
+            self._unsub_watchdog = async_track_time_interval(
+                self._hass,
+                self._async_watchdog,
+                timedelta(seconds=WORKER_WATCHDOG_INTERVAL),
+                name=f"myStrom poll worker {self._index} watchdog",
+            )
+        self.async_send(subscription.command)
+
+    @callback
+    def async_remove(self, subscription: PollWorkerSubscription) -> None:
+        """Stop polling a host."""
+        if self._subscriptions.get(subscription.host) is subscription:
+            del self._subscriptions[subscription.host]
+            self.async_send({"op": "remove", "host": subscription.host})
+
+    @callback
+    def async_send(self, command: dict[str, Any]) -> None:
+        """Send a command to the process if it is running.
+
+        Commands sent while the process is (re)starting are not lost: the
+        hosts and their pending polls are replayed once it is up.
+        """
+        process = self._process
+        if process is None or process.stdin is None or process.returncode is not None:
+            return
+        line = json.dumps(command, separators=(",", ":")) + "\n"
+        process.stdin.write(line.encode())
+
+    async def async_stop(self) -> None:
+        """Stop the process."""
+        self._stopping = True
+        if self._unsub_watchdog is not None:
+            self._unsub_watchdog()
+            self._unsub_watchdog = None
+        if (process := self._process) is None or process.returncode is not None:
+            return
+        if process.stdin is not None:
+            process.stdin.close()
+        try:
+            async with asyncio.timeout(5):
+                await process.wait()
+        except TimeoutError:
+            process.kill()
+
+    async def _async_run(self) -> None:
+        """Run the process, restart it whenever it exits."""
+        while not self._stopping:
+            try:
+                await self._async_run_once()
+            except OSError as err:
+                _LOGGER.error("Could not start myStrom poll worker: %s", err)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("myStrom poll worker %s failed", self._index)
+            if (process := self._process) is not None and process.returncode is None:
+                process.kill()
+                await process.wait()
+            self._process = None
+            if self._stopping:
+                for subscription in self._subscriptions.values():
+                    subscription.async_fail_waiters("poll worker stopped")
+                return
+            for subscription in list(self._subscriptions.values()):
+                subscription.async_fail("poll worker exited")
+            self.restarts += 1
+            _LOGGER.warning(
+                "myStrom poll worker %s exited, restarting in %ss",
+                self._index,
+                WORKER_RESTART_DELAY,
+            )
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+
+    async def _async_run_once(self) -> None:
+        """Start the process, hand it the hosts and read its batches."""
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            str(_WORKER_SCRIPT),
+            "--worker",
+            f"--batch-interval={self._batch_interval}",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=_LINE_LIMIT,
+        )
+        self._process = process
+        for subscription in self._subscriptions.values():
+            subscription.async_restarted()
+            self.async_send(subscription.command)
+            if subscription.waiters:
+                self.async_send({"op": "poll", "host": subscription.host})
+
+        assert process.stdout is not None
+        while True:
+            try:
+                line = await process.stdout.readline()
+            except ValueError as err:
+                # Longer than the limit, the rest of the line is dropped
+                _LOGGER.warning(
+                    "Dropping batch of myStrom poll worker %s: %s", self._index, err
+                )
+                continue
+            if not line:
+                break
+            try:
+                self._async_handle_batch(json_loads(line))
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception(
+                    "Dropping invalid batch of myStrom poll worker %s", self._index
+                )
+        await process.wait()
+
+    @callback
+    def _async_watchdog(self, now: datetime) -> None:
+        """Fail the hosts without recent results, restart a stuck process."""
+        process = self._process
+        if process is None or process.returncode is not None:
+            # Failed when the process exited, a new one is on the way
+            return
+        monotonic = time.monotonic()
+        overdue = [
+            subscription
+            for subscription in self._subscriptions.values()
+            if subscription.overdue(monotonic)
+        ]
+        for subscription in overdue:
+            subscription.async_fail("no results from the poll worker")
+        if overdue and len(overdue) == len(self._subscriptions):
+            _LOGGER.warning(
+                "myStrom poll worker %s stopped sending results, restarting",
+                self._index,
+            )
+            process.kill()
+
+    @callback
+    def _async_handle_batch(self, batch: dict[str, Any]) -> None:
+        """Pass the results of a batch to the subscriptions."""
+        self.batches += 1
+        subscriptions = self._subscriptions
+        for host, (latency, errors, received) in batch["stats"].items():
+            if (subscription := subscriptions.get(host)) is not None:
+                subscription.async_update_stats(latency, errors, received)
+        for host, requested_at, fields, error, polled in batch["results"]:
+            if (subscription := subscriptions.get(host)) is None:
+                continue
+            self.records += 1
+            report = None
+            if fields is not None:
+                try:
+                    report = MyStromReport.from_dict(fields)
+                except MyStromReportError as err:
+                    error = str(err)
+            subscription.async_deliver(requested_at, report, error, polled)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the process for diagnostics."""
+        process = self._process
+        return {
+            "pid": process.pid if process is not None else None,
+            "hosts": len(self._subscriptions),
+            "restarts": self.restarts,
+            "batches": self.batches,
+            "records": self.records,
+        }